@@ -8,23 +8,14 @@ CLI интерфейс для Mic Stream Py
 """
 
 import argparse
+import functools
 import sys
 import os
-from pathlib import Path
-
-# Добавляем корень проекта в путь для импортов
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
-
-# Импортируем функции из клиентских модулей
-try:
-    from mic_stream_py.client.minimal_editor import main as minimal_editor_main
-except ImportError:
-    minimal_editor_main = None
 
 
+@functools.lru_cache(maxsize=None)
 def create_parser() -> argparse.ArgumentParser:
-    """Создает парсер аргументов командной строки"""
+    """Создает парсер аргументов командной строки (строится один раз на процесс)"""
     parser = argparse.ArgumentParser(
         prog="mic-stream",
         description="Real-time Speech-to-Text Client CLI",
@@ -71,45 +62,89 @@ def main():
     main_client(args)
 
 
+# Кеш найденного .env файла и разобранных значений (ключ - путь, значение - (mtime, dict))
+_ENV_PATH_CACHE = None
+_ENV_CACHE = {}
+
+
+# Кандидаты на .env файл после текущей директории, в порядке приоритета.
+# Пути раскрываются один раз при импорте, а не при каждом поиске
+_ENV_SEARCH_PATHS = (
+    # 2. Домашний каталог пользователя
+    os.path.expanduser('~/.env'),
+    # 3. Домашний каталог с именем mic-stream.env
+    os.path.expanduser('~/mic-stream.env'),
+    # 4. XDG config directory
+    os.path.expanduser('~/.config/mic-stream/.env'),
+    # 5. XDG data directory
+    os.path.expanduser('~/.local/share/mic-stream/.env'),
+    # 6. Запасной вариант - исходный проект (для development)
+    os.path.join(os.path.dirname(__file__), "..", ".env"),
+)
+
+
+def _iter_env_candidates():
+    """Кандидаты на .env файл в порядке приоритета"""
+    # 1. Текущая рабочая директория (может меняться, поэтому вычисляется при вызове)
+    yield os.path.join(os.getcwd(), '.env')
+    yield from _ENV_SEARCH_PATHS
+
+
 def find_env_file():
-    """Поиск .env файла в стандартных местах"""
-    # Места поиска по приоритету
-    search_paths = [
-        # 1. Текущая рабочая директория
-        os.path.join(os.getcwd(), '.env'),
-        # 2. Домашний каталог пользователя
-        os.path.expanduser('~/.env'),
-        # 3. Домашний каталог с именем mic-stream.env
-        os.path.expanduser('~/mic-stream.env'),
-        # 4. XDG config directory
-        os.path.expanduser('~/.config/mic-stream/.env'),
-        # 5. XDG data directory
-        os.path.expanduser('~/.local/share/mic-stream/.env'),
-        # 6. Запасной вариант - исходный проект (для development)
-        os.path.join(os.path.dirname(__file__), "..", ".env"),
-    ]
-
-    for env_file in search_paths:
-        if os.path.exists(env_file):
+    """Поиск .env файла в стандартных местах (результат кешируется)"""
+    global _ENV_PATH_CACHE
+    if _ENV_PATH_CACHE is not None:
+        return _ENV_PATH_CACHE
+
+    # Останавливаемся на первом найденном файле
+    for env_file in _iter_env_candidates():
+        if os.path.isfile(env_file):
+            _ENV_PATH_CACHE = env_file
             return env_file
     return None
 
+
+def _parse_env_file(env_file):
+    """Разбор .env файла в словарь"""
+    values = {}
+    # Читаем файл целиком: один read и одно декодирование вместо построчного чтения
+    with open(env_file, 'rb') as f:
+        text = f.read().decode('utf-8')
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line[0] == '#':
+            continue
+        key, sep, value = line.partition('=')
+        if sep:
+            values[key.strip()] = value.strip()
+    return values
+
+
 def load_env_file(env_file=None):
     """Загрузка переменных окружения из файла"""
     if env_file is None:
         env_file = find_env_file()
 
-    if env_file and os.path.exists(env_file):
+    try:
+        mtime = os.stat(env_file).st_mtime if env_file else None
+    except OSError:
+        mtime = None
+
+    if mtime is not None:
         print(f"Загрузка конфигурации из: {env_file}")
         try:
-            with open(env_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        if '=' in line:
-                            key, value = line.split('=', 1)
-                            os.environ[key.strip()] = value.strip()
-                            print(f"  {key.strip()}={value.strip()}")
+            # Повторно читаем файл только если он изменился
+            cached = _ENV_CACHE.get(env_file)
+            if cached is not None and cached[0] == mtime:
+                values = cached[1]
+            else:
+                values = _parse_env_file(env_file)
+                _ENV_CACHE[env_file] = (mtime, values)
+
+            os.environ.update(values)
+            for key, value in values.items():
+                print(f"  {key}={value}")
         except Exception as e:
             print(f"⚠️ Ошибка чтения файла конфигурации: {e}")
     else:
@@ -117,8 +152,20 @@ def load_env_file(env_file=None):
         print("Используются значения по умолчанию")
         print("💡 Для настройки создайте .env файл в текущей директории или домашней папке")
 
-def main_client(args):
+def main_client(args=None):
     """Точка входа для stt-client команды"""
+    if args is None:
+        args = create_parser().parse_args()
+
+    # Клиент импортируем только здесь: он тянет pyaudio и prompt_toolkit,
+    # которые не нужны для --help и разбора аргументов.
+    # Импорт выполняется до загрузки .env, так как модуль клиента при импорте
+    # читает собственный .env, а URL ниже должны иметь приоритет
+    try:
+        from mic_stream_py.client.minimal_editor import main as minimal_editor_main
+    except ImportError:
+        minimal_editor_main = None
+
     # Ищем и загружаем .env файл в стандартных местах
     load_env_file()
     
@@ -132,22 +179,22 @@ def main_client(args):
     
     print(f"🎤 Запуск STT клиента для {args.server}:{args.control_port}")
     
-    # Подготавливаем аргументы для оригинальной функции (только --test)
-    original_args = []
-    if args.test:
-        original_args.append('--test')
-    
-    # Заменяем sys.argv для оригинальной функции
-    sys.argv = ['stt-client'] + original_args
-    
     if minimal_editor_main is None:
         print("❌ Модуль клиента не найден")
         print("💡 Установите зависимости: pip install -e .")
         sys.exit(1)
     
-    # Вызываем оригинальную main функцию (асинхронную)
-    import asyncio
-    asyncio.run(minimal_editor_main())
+    # Вызываем main функцию клиента (асинхронную), передавая уже разобранный
+    # флаг --test, чтобы клиент не строил второй парсер поверх sys.argv.
+    # uvloop (опционально, pip install mic-stream-py[fast]) снижает накладные
+    # расходы event loop на потоковой отправке аудио через WebSocket
+    try:
+        import uvloop
+        run = uvloop.run
+    except (ImportError, AttributeError):
+        import asyncio
+        run = asyncio.run
+    run(minimal_editor_main(test=args.test))
 
 
 # Функция main_gui удалена, так как GUI клиента нет в проекте
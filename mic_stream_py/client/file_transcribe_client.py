@@ -4,22 +4,515 @@
 Простая утилита командной строки для быстрой транскрипции MP3/WAV файлов.
 """
 
+from __future__ import annotations
+
+import io
+import json
 import os
+import random
+import time
 import sys
+import uuid
+import zlib
+import struct
+import threading
 import argparse
-import requests
+import mimetypes
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# requests импортируется при первом сетевом запросе: --help и разбор аргументов
+# не платят за загрузку requests/urllib3
+requests = None
+
+
+def _import_requests() -> None:
+    """Импорт requests в глобальное пространство модуля"""
+    global requests
+    if requests is None:
+        import requests
+
+try:
+    # Опциональный быстрый JSON парсер (pip install orjson)
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Общая сессия: keep-alive соединение переиспользуется между запросами
+_SESSION: Optional[requests.Session] = None
+
+
+def create_session() -> requests.Session:
+    """
+    Создание HTTP сессии с пулом соединений и повтором при ошибках подключения.
+    
+    Адаптер повторяет только неудачные попытки установить соединение.
+    Повтор по статусу ответа выполняет _send_transcribe (RETRYABLE_STATUSES).
+    """
+    _import_requests()
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(connect=3, read=0, status=0, backoff_factor=0.3)
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Общая сессия модуля (создается при первом обращении)"""
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = create_session()
+    return _SESSION
+
+
+def close() -> None:
+    """Закрытие общей сессии и ее соединений"""
+    global _SESSION
+    if _SESSION is not None:
+        _SESSION.close()
+        _SESSION = None
+
+
+def warmup_connection(server_url: str, session: Optional[requests.Session] = None) -> threading.Thread:
+    """
+    Фоновый HEAD /health для установки соединения заранее.
+    
+    DNS и TCP подключение выполняются параллельно с подготовкой файла, а готовое
+    keep-alive соединение остается в пуле сессии и используется основным запросом.
+    """
+    _import_requests()
+    if session is None:
+        session = get_session()
+    
+    def warmup():
+        try:
+            session.head(f"{server_url}/health", timeout=2)
+        except requests.exceptions.RequestException:
+            # Ошибки подключения покажет основной запрос
+            pass
+    
+    thread = threading.Thread(target=warmup, name='http-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+# Повтор запроса при временной недоступности сервера (перегрузка, перезапуск, прокси).
+# Задержка: RETRY_BASE_DELAY * 2^попытка * (1 + случайная доля до RETRY_JITTER), не больше RETRY_MAX_DELAY
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1.0
+RETRY_JITTER = 0.5
+RETRY_MAX_DELAY = 30.0
+
+# Статусы, после которых имеет смысл повторить запрос. 500 сюда не входит:
+# сервер отвечает им на ошибку транскрипции, и повтор с тем же файлом ее не исправит
+RETRYABLE_STATUSES = frozenset((408, 429, 502, 503, 504))
+
+
+def _retry_delay(attempt: int, response=None) -> float:
+    """Задержка перед повтором с экспоненциальным ростом и случайным разбросом"""
+    delay = RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random() * RETRY_JITTER)
+    # Сервер может сам указать, через сколько секунд повторить
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+    return min(delay, RETRY_MAX_DELAY)
+
+
+# Размер блока при чтении файла для отправки: файл открывается без буферизации,
+# поэтому каждый блок - один read() прямо в готовый для отправки bytes
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Таймауты запроса: (подключение, ожидание ответа) - мертвое соединение обнаруживается быстро,
+# а на саму транскрипцию больших файлов остается 10 минут
+REQUEST_TIMEOUT = (10, 600)
+
+
+class _MultipartBody:
+    """
+    Потоковое multipart/form-data тело запроса.
+    
+    Файл читается с диска блоками прямо во время отправки, поэтому в памяти
+    не собирается все тело запроса. Длина известна заранее, и requests
+    отправляет Content-Length вместо chunked кодирования.
+    """
+    
+    def __init__(self, fields: Dict[str, str], file_field: str, file_name: str, file_obj: BinaryIO,
+                 progress: bool = False):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self._file = file_obj
+        self._progress = progress
+        
+        parts = []
+        for name, value in fields.items():
+            parts.append(
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n'.encode('utf-8')
+            )
+        mime_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+        quoted_name = file_name.replace('\\', '\\\\').replace('"', '%22')
+        parts.append(
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{file_field}"; filename="{quoted_name}"\r\n'
+            f'Content-Type: {mime_type}\r\n\r\n'.encode('utf-8')
+        )
+        self._head = b''.join(parts)
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('ascii')
+        
+        # Размер через seek/tell: работает и для файлов, и для io.BytesIO
+        self._file_size = file_obj.seek(0, os.SEEK_END)
+        file_obj.seek(0)
+        self._length = len(self._head) + self._file_size + len(self._tail)
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __iter__(self) -> Iterator[bytes]:
+        # При повторной попытке соединения тело отправляется заново с начала файла
+        self._file.seek(0)
+        yield self._head
+        
+        sent = 0
+        last_percent = -1
+        while True:
+            chunk = self._file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+            
+            if self._progress:
+                sent += len(chunk)
+                percent = sent * 100 // max(self._file_size, 1)
+                if percent != last_percent:
+                    last_percent = percent
+                    print(f"\r📤 Отправка: {percent}%", end='', flush=True)
+        
+        if self._progress:
+            print()
+        yield self._tail
+
+
+class _GzipBody:
+    """
+    Сжатие тела запроса gzip на лету (Content-Encoding: gzip).
+    
+    Итоговая длина заранее неизвестна, поэтому requests отправляет тело
+    chunked кодированием; aiohttp на сервере распаковывает его автоматически.
+    """
+    
+    def __init__(self, body, level: int = 6):
+        self._body = body
+        self._level = level
+    
+    def __iter__(self) -> Iterator[bytes]:
+        # wbits=31 - формат gzip (заголовок и CRC), а не голый deflate
+        compressor = zlib.compressobj(self._level, zlib.DEFLATED, 31)
+        chunks = (self._body,) if isinstance(self._body, (bytes, bytearray)) else self._body
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+
+# Форматы без собственного сжатия, для которых gzip заметно уменьшает объем
+COMPRESSIBLE_EXTENSIONS = ('.wav', '.pcm', '.raw')
+
+
+class _FileRange:
+    """Потоковое тело запроса из участка файла (например, PCM данные внутри WAV)"""
+    
+    def __init__(self, file_obj: BinaryIO, offset: int, length: int):
+        self._file = file_obj
+        self._offset = offset
+        self._length = length
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __iter__(self) -> Iterator[bytes]:
+        self._file.seek(self._offset)
+        remaining = self._length
+        while remaining > 0:
+            chunk = self._file.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+_RIFF_HEADER = struct.Struct('<4sI4s')
+_CHUNK_HEADER = struct.Struct('<4sI')
+_FMT_PCM = struct.Struct('<HHIIHH')
+
+# Коды формата WAV: PCM и WAVE_FORMAT_EXTENSIBLE (с PCM подформатом)
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _find_wav_pcm(f: BinaryIO, file_size: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Поиск PCM16 данных внутри WAV файла.
+    
+    Returns:
+        (sample_rate, channels, offset, length) или None, если файл не PCM16 WAV
+    """
+    f.seek(0)
+    riff, _, wave = _RIFF_HEADER.unpack(f.read(_RIFF_HEADER.size).ljust(_RIFF_HEADER.size, b'\0'))
+    if riff != b'RIFF' or wave != b'WAVE':
+        return None
+    
+    fmt = None
+    position = _RIFF_HEADER.size
+    while position + _CHUNK_HEADER.size <= file_size:
+        f.seek(position)
+        chunk_id, chunk_size = _CHUNK_HEADER.unpack(f.read(_CHUNK_HEADER.size))
+        data_offset = position + _CHUNK_HEADER.size
+        
+        if chunk_id == b'fmt ':
+            # Обрезанный файл или короткий fmt чанк - быстрый путь невозможен
+            fmt_bytes = f.read(_FMT_PCM.size)
+            if chunk_size < _FMT_PCM.size or len(fmt_bytes) < _FMT_PCM.size:
+                return None
+            format_tag, channels, sample_rate, _, _, bits = _FMT_PCM.unpack(fmt_bytes)
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b'data':
+            if fmt is None:
+                return None
+            format_tag, channels, sample_rate, bits = fmt
+            if format_tag not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_EXTENSIBLE) or bits != 16:
+                return None
+            # Размер data может быть не записан (потоковая запись) - ограничиваем концом файла
+            length = min(chunk_size, file_size - data_offset)
+            return sample_rate, channels, data_offset, length
+        
+        # Чанки выровнены по четной границе
+        position = data_offset + chunk_size + (chunk_size & 1)
+    
+    return None
+
+
+def _send_transcribe(
+    session: requests.Session,
+    server_url: str,
+    body,
+    headers: Dict[str, str],
+    params: Optional[Dict[str, str]] = None,
+    compress: bool = False,
+    retry_attempts: int = RETRY_ATTEMPTS
+) -> dict:
+    """
+    POST на /transcribe с обработкой ошибок.
+    
+    Args:
+        retry_attempts: Число повторов при временных ошибках (0 для одноразовых тел, например генераторов)
+    
+    Returns:
+        Словарь с результатами транскрипции
+    """
+    # Сессия могла быть передана снаружи - requests нужен для обработки исключений ниже
+    _import_requests()
+    
+    url = f"{server_url}/transcribe"
+    response = None
+    try:
+        for attempt in range(retry_attempts + 1):
+            # Отправляем запрос: аудио читается блоками во время отправки
+            if compress:
+                response = session.post(
+                    url,
+                    data=_GzipBody(body),
+                    params=params,
+                    headers={**headers, 'Content-Encoding': 'gzip'},
+                    timeout=REQUEST_TIMEOUT
+                )
+                # Сервер не принимает сжатые запросы - повторяем без сжатия
+                if response.status_code == 415:
+                    compress = False
+            
+            if not compress:
+                response = session.post(
+                    url,
+                    data=body,
+                    params=params,
+                    headers=headers,
+                    timeout=REQUEST_TIMEOUT
+                )
+            
+            # Остальные ошибки (4xx, 500) повтором не исправляются
+            if response.status_code not in RETRYABLE_STATUSES or attempt == retry_attempts:
+                break
+            
+            delay = _retry_delay(attempt, response)
+            print(f"⏳ Сервер ответил {response.status_code}, повтор через {delay:.1f} сек "
+                  f"({attempt + 1}/{retry_attempts})", file=sys.stderr)
+            time.sleep(delay)
+        
+        # Проверяем статус ответа
+        response.raise_for_status()
+        
+        # Парсим результат прямо из байтов ответа, без промежуточного декодирования в str
+        return _json_loads(response.content)
+        
+    except requests.exceptions.Timeout:
+        print("❌ Ошибка: Превышено время ожидания ответа от сервера")
+        raise
+    except requests.exceptions.ConnectionError:
+        print(f"❌ Ошибка: Не удалось подключиться к серверу {server_url}")
+        print("   Убедитесь что сервер запущен и доступен")
+        raise
+    except requests.exceptions.HTTPError as e:
+        print(f"❌ Ошибка HTTP: {e}")
+        if response is not None and response.text:
+            try:
+                error_data = _json_loads(response.content)
+                print(f"   Сообщение: {error_data.get('error', 'Неизвестная ошибка')}")
+            except:
+                print(f"   Ответ: {response.text}")
+        raise
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        raise
+
+
+def _request_params(
+    beam_size: Optional[int],
+    language: Optional[str],
+    include_segments: bool,
+    vad_filter: Optional[bool]
+) -> Dict[str, str]:
+    """Параметры транскрипции (поля формы или query string)"""
+    params = {
+        'include_segments': 'true' if include_segments else 'false'
+    }
+    
+    # Без явных beam_size / vad_filter сервер использует FILE_BEAM_SIZE / FILE_VAD_FILTER
+    if beam_size is not None:
+        params['beam_size'] = str(beam_size)
+    if vad_filter is not None:
+        params['vad_filter'] = 'true' if vad_filter else 'false'
+    if language:
+        params['language'] = language
+    return params
+
+
+def _post_audio(
+    session: requests.Session,
+    buf: BinaryIO,
+    name: str,
+    server_url: str,
+    beam_size: Optional[int],
+    language: Optional[str],
+    include_segments: bool,
+    vad_filter: Optional[bool],
+    verbose: bool,
+    compress: bool = False
+) -> dict:
+    """
+    Отправка аудио из файлового объекта на /transcribe (multipart/form-data).
+    
+    Args:
+        session: HTTP сессия
+        buf: Файловый объект с аудио (файл на диске или io.BytesIO)
+        name: Имя файла для сервера (по расширению определяется формат)
+        compress: Сжимать тело запроса gzip (только для несжатых форматов, например WAV)
+        
+    Returns:
+        Словарь с результатами транскрипции
+    """
+    data = _request_params(beam_size, language, include_segments, vad_filter)
+    body = _MultipartBody(data, 'file', name, buf, progress=verbose)
+    compress = compress and name.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+    
+    return _send_transcribe(session, server_url, body, {'Content-Type': body.content_type}, compress=compress)
+
+
+def _post_pcm(
+    session: requests.Session,
+    body,
+    sample_rate: int,
+    channels: int,
+    server_url: str,
+    beam_size: Optional[int],
+    language: Optional[str],
+    include_segments: bool,
+    vad_filter: Optional[bool],
+    compress: bool = False,
+    retry_attempts: int = RETRY_ATTEMPTS
+) -> dict:
+    """
+    Отправка сырого PCM16 LE на /transcribe без WAV контейнера и multipart.
+    
+    Параметры формата передаются заголовками, параметры транскрипции - в query string.
+    Если body - генератор, requests отправляет его chunked-запросом по мере поступления блоков.
+    
+    Returns:
+        Словарь с результатами транскрипции
+    """
+    headers = {
+        'Content-Type': 'application/octet-stream',
+        'X-Sample-Rate': str(sample_rate),
+        'X-Channels': str(channels),
+        'X-Dtype': 'int16',
+    }
+    params = _request_params(beam_size, language, include_segments, vad_filter)
+    
+    return _send_transcribe(
+        session, server_url, body, headers, params=params, compress=compress, retry_attempts=retry_attempts
+    )
+
+
+def _report_result(result: dict, output_file: Optional[str], verbose: bool) -> None:
+    """Вывод результата и сохранение в файл если указан"""
+    if verbose:
+        text = result.get('text', '')
+        separator = "-" * 60
+        print(
+            f"✅ Транскрипция завершена!\n"
+            f"🌍 Язык: {result.get('language', 'unknown')}\n"
+            f"⏱️  Длительность: {result.get('duration', 0):.2f} сек\n"
+            f"📝 Текст ({len(text)} символов):\n"
+            f"{separator}\n{text}\n{separator}"
+        )
+    
+    # Сохраняем в файл если указан
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as out:
+            out.write(result.get('text', ''))
+            
+            # Добавляем сегменты если есть
+            if 'segments' in result:
+                out.write('\n\n--- Временные метки ---\n')
+                out.writelines(
+                    f"[{seg['start']:.2f}s - {seg['end']:.2f}s] {seg['text']}\n" for seg in result['segments']
+                )
+        
+        if verbose:
+            print(f"💾 Результат сохранен в: {output_file}")
+
 
 def transcribe_file(
     file_path: str,
     server_url: str = "http://localhost:8013",
     output_file: Optional[str] = None,
-    beam_size: int = 5,
+    beam_size: Optional[int] = None,
     language: Optional[str] = None,
     include_segments: bool = False,
-    vad_filter: bool = False,
-    verbose: bool = True
+    vad_filter: Optional[bool] = None,
+    verbose: bool = True,
+    session: Optional[requests.Session] = None,
+    compress: bool = False,
+    raw_pcm: bool = False
 ) -> dict:
     """
     Отправка аудио файла на транскрипцию.
@@ -28,101 +521,253 @@ def transcribe_file(
         file_path: Путь к аудио файлу
         server_url: URL сервера (default: http://genaminipc.awg:8013)
         output_file: Путь для сохранения текста (опционально)
-        beam_size: Размер beam search (1-10, выше = лучше качество)
+        beam_size: Размер beam search (1-10, None - значение сервера FILE_BEAM_SIZE)
         language: Язык аудио (ru, en, auto, ...)
         include_segments: Включить временные метки в результат
         verbose: Выводить подробную информацию
+        session: HTTP сессия (по умолчанию общая сессия модуля)
+        compress: Сжимать загрузку gzip (для WAV/PCM файлов)
+        raw_pcm: Для PCM16 WAV отправлять только PCM данные (сервер не разбирает WAV)
         
     Returns:
         Словарь с результатами транскрипции
     """
-    # Проверяем существование файла
-    if not os.path.exists(file_path):
+    # Проверяем существование файла и получаем размер одним stat
+    try:
+        file_size = os.stat(file_path).st_size
+        file_size_mb = file_size / (1024 * 1024)
+    except FileNotFoundError:
         raise FileNotFoundError(f"Файл не найден: {file_path}")
     
-    file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-    
     if verbose:
-        print(f"📁 Файл: {file_path}")
-        print(f"📊 Размер: {file_size_mb:.2f} MB")
-        print(f"🌐 Сервер: {server_url}")
-        print(f"⚙️  Параметры: beam_size={beam_size}, language={language or 'auto'}")
-        print(f"📤 Отправка файла на транскрипцию...")
-    
-    # Подготавливаем данные для отправки
-    with open(file_path, 'rb') as f:
-        files = {'file': (os.path.basename(file_path), f)}
-        
-        # Формируем параметры
-        data = {
-            'beam_size': str(beam_size),
-            'include_segments': 'true' if include_segments else 'false',
-            'vad_filter': 'true' if vad_filter else 'false'
-        }
-        
-        if language:
-            data['language'] = language
+        print(
+            f"📁 Файл: {file_path}\n"
+            f"📊 Размер: {file_size_mb:.2f} MB\n"
+            f"🌐 Сервер: {server_url}\n"
+            f"⚙️  Параметры: beam_size={beam_size or 'сервер'}, language={language or 'auto'}"
+        )
+    
+    if session is None:
+        session = get_session()
+    
+    with open(file_path, 'rb', buffering=0) as f:
+        pcm_info = None
+        if raw_pcm and file_path.lower().endswith('.wav'):
+            pcm_info = _find_wav_pcm(f, file_size)
+            if pcm_info is None and verbose:
+                print("ℹ️  Файл не PCM16 WAV - отправляется целиком")
         
-        response = None
-        try:
-            # Отправляем запрос
-            response = requests.post(
-                f"{server_url}/transcribe",
-                files=files,
-                data=data,
-                timeout=600  # 10 минут таймаут для больших файлов
+        if pcm_info is not None:
+            sample_rate, channels, offset, length = pcm_info
+            result = _post_pcm(
+                session, _FileRange(f, offset, length), sample_rate, channels, server_url,
+                beam_size, language, include_segments, vad_filter,
+                compress=compress
             )
-            
-            # Проверяем статус ответа
-            response.raise_for_status()
-            
-            # Парсим результат
-            result = response.json()
-            
-            if verbose:
-                print(f"✅ Транскрипция завершена!")
-                print(f"🌍 Язык: {result.get('language', 'unknown')}")
-                print(f"⏱️  Длительность: {result.get('duration', 0):.2f} сек")
-                print(f"📝 Текст ({len(result.get('text', ''))} символов):")
-                print("-" * 60)
-                print(result.get('text', ''))
-                print("-" * 60)
-            
-            # Сохраняем в файл если указан
-            if output_file:
-                with open(output_file, 'w', encoding='utf-8') as out:
-                    out.write(result.get('text', ''))
-                    
-                    # Добавляем сегменты если есть
-                    if 'segments' in result:
-                        out.write('\n\n--- Временные метки ---\n')
-                        for seg in result['segments']:
-                            out.write(f"[{seg['start']:.2f}s - {seg['end']:.2f}s] {seg['text']}\n")
-                
-                if verbose:
-                    print(f"💾 Результат сохранен в: {output_file}")
-            
-            return result
-            
-        except requests.exceptions.Timeout:
-            print("❌ Ошибка: Превышено время ожидания ответа от сервера")
-            raise
-        except requests.exceptions.ConnectionError:
-            print(f"❌ Ошибка: Не удалось подключиться к серверу {server_url}")
-            print("   Убедитесь что сервер запущен и доступен")
-            raise
-        except requests.exceptions.HTTPError as e:
-            print(f"❌ Ошибка HTTP: {e}")
-            if response and response.text:
-                try:
-                    error_data = response.json()
-                    print(f"   Сообщение: {error_data.get('error', 'Неизвестная ошибка')}")
-                except:
-                    print(f"   Ответ: {response.text}")
-            raise
-        except Exception as e:
-            print(f"❌ Ошибка: {e}")
-            raise
+        else:
+            result = _post_audio(
+                session, f, os.path.basename(file_path), server_url,
+                beam_size, language, include_segments, vad_filter, verbose,
+                compress=compress
+            )
+    
+    _report_result(result, output_file, verbose)
+    return result
+
+
+def transcribe_bytes(
+    audio: bytes,
+    file_name: str = "audio.wav",
+    server_url: str = "http://localhost:8013",
+    output_file: Optional[str] = None,
+    beam_size: Optional[int] = None,
+    language: Optional[str] = None,
+    include_segments: bool = False,
+    vad_filter: Optional[bool] = None,
+    verbose: bool = False,
+    session: Optional[requests.Session] = None,
+    compress: bool = False
+) -> dict:
+    """
+    Отправка аудио из памяти на транскрипцию (без записи во временный файл).
+    
+    Args:
+        audio: Содержимое аудио файла (WAV, MP3, ...)
+        file_name: Имя файла для сервера (по расширению определяется формат)
+        Остальные параметры - см. transcribe_file
+        
+    Returns:
+        Словарь с результатами транскрипции
+    """
+    if session is None:
+        session = get_session()
+    
+    result = _post_audio(
+        session, io.BytesIO(audio), file_name, server_url,
+        beam_size, language, include_segments, vad_filter, verbose,
+        compress=compress
+    )
+    
+    _report_result(result, output_file, verbose)
+    return result
+
+
+def transcribe_pcm(
+    pcm: bytes,
+    sample_rate: int = 16000,
+    channels: int = 1,
+    server_url: str = "http://localhost:8013",
+    output_file: Optional[str] = None,
+    beam_size: Optional[int] = None,
+    language: Optional[str] = None,
+    include_segments: bool = False,
+    vad_filter: Optional[bool] = None,
+    verbose: bool = False,
+    session: Optional[requests.Session] = None,
+    compress: bool = False
+) -> dict:
+    """
+    Отправка сырого PCM16 LE из памяти на транскрипцию (без WAV заголовка).
+    
+    Args:
+        pcm: PCM данные (int16, little-endian, чередующиеся каналы)
+        sample_rate: Частота дискретизации
+        channels: Количество каналов
+        Остальные параметры - см. transcribe_file
+        
+    Returns:
+        Словарь с результатами транскрипции
+    """
+    if session is None:
+        session = get_session()
+    
+    result = _post_pcm(
+        session, pcm, sample_rate, channels, server_url,
+        beam_size, language, include_segments, vad_filter,
+        compress=compress
+    )
+    
+    _report_result(result, output_file, verbose)
+    return result
+
+
+def transcribe_pcm_stream(
+    chunks: Iterable[bytes],
+    sample_rate: int = 16000,
+    channels: int = 1,
+    server_url: str = "http://localhost:8013",
+    output_file: Optional[str] = None,
+    beam_size: Optional[int] = None,
+    language: Optional[str] = None,
+    include_segments: bool = False,
+    vad_filter: Optional[bool] = None,
+    verbose: bool = False,
+    session: Optional[requests.Session] = None
+) -> dict:
+    """
+    Потоковая отправка PCM16 LE на транскрипцию по мере захвата (chunked transfer encoding).
+    
+    Соединение открывается сразу, блоки уходят на сервер по мере их появления в chunks,
+    поэтому после окончания записи остается дождаться только самой транскрипции.
+    Итератор читается один раз, поэтому запрос не повторяется и не сжимается.
+    
+    Args:
+        chunks: Итератор блоков PCM (например, генератор, читающий микрофон до остановки записи)
+        Остальные параметры - см. transcribe_pcm
+        
+    Returns:
+        Словарь с результатами транскрипции
+    """
+    if session is None:
+        session = get_session()
+    
+    result = _post_pcm(
+        session, iter(chunks), sample_rate, channels, server_url,
+        beam_size, language, include_segments, vad_filter,
+        retry_attempts=0
+    )
+    
+    _report_result(result, output_file, verbose)
+    return result
+
+
+def transcribe_files(
+    file_paths: List[str],
+    concurrency: int = 4,
+    output_dir: Optional[str] = None,
+    **kwargs
+) -> Iterator[Tuple[str, Union[dict, Exception]]]:
+    """
+    Параллельная транскрипция нескольких файлов через одну HTTP сессию.
+    
+    Запросы выполняются в пуле из concurrency потоков и переиспользуют
+    keep-alive соединения общей сессии.
+    
+    Args:
+        file_paths: Пути к аудио файлам
+        concurrency: Максимальное число одновременных запросов
+        output_dir: Каталог для сохранения результатов (<имя файла>.txt)
+        **kwargs: Параметры transcribe_file (server_url, beam_size, language, ...)
+        
+    Yields:
+        (путь, результат) по мере завершения; при ошибке вместо результата - исключение
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    kwargs.setdefault('session', get_session())
+    kwargs.setdefault('verbose', False)
+    
+    def output_for(path: str) -> Optional[str]:
+        if output_dir is None:
+            return None
+        return os.path.join(output_dir, Path(path).stem + '.txt')
+    
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(transcribe_file, path, output_file=output_for(path), **kwargs): path
+            for path in file_paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                yield path, future.result()
+            except Exception as e:
+                yield path, e
+
+
+def _main_many(args) -> int:
+    """Транскрипция нескольких файлов из командной строки, возвращает код выхода"""
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    
+    failed = 0
+    for path, result in transcribe_files(
+        args.file,
+        concurrency=args.concurrency,
+        output_dir=args.output,
+        server_url=args.server,
+        beam_size=args.beam_size,
+        language=args.language,
+        include_segments=args.segments,
+        vad_filter=args.vad,
+        compress=args.compress,
+        raw_pcm=args.raw_pcm
+    ):
+        name = os.path.basename(path)
+        if isinstance(result, Exception):
+            failed += 1
+            if not args.quiet:
+                print(f"[{name}] ❌ Ошибка: {result}", file=sys.stderr)
+        elif args.quiet:
+            print(f"[{name}] {result.get('text', '')}")
+        else:
+            print(f"[{name}] ✅ {result.get('duration', 0):.2f} сек, язык: {result.get('language', 'unknown')}")
+            print(result.get('text', ''))
+    
+    if not args.quiet:
+        print(f"Готово: {len(args.file) - failed}/{len(args.file)} файлов")
+    return 1 if failed else 0
+
 
 def main():
     """Главная функция командной строки."""
@@ -146,39 +791,62 @@ def main():
   
   # Указать другой сервер
   python3 file_transcribe_client.py audio.mp3 -s http://localhost:8013
+  
+  # Несколько файлов параллельно, результаты в каталог
+  python3 file_transcribe_client.py *.mp3 --concurrency 4 -o transcripts/
 
 Поддерживаемые форматы: MP3, WAV, M4A, FLAC, OGG, OPUS
         """
     )
     
-    parser.add_argument('file', help='Путь к аудио файлу')
-    parser.add_argument('-o', '--output', help='Файл для сохранения результата')
+    parser.add_argument('file', nargs='+', help='Путь к аудио файлу (можно указать несколько)')
+    parser.add_argument('-o', '--output',
+                       help='Файл для сохранения результата (для нескольких файлов - каталог)')
     parser.add_argument('-s', '--server', default='http://localhost:8013',
                        help='URL сервера (default: http://localhost:8013)')
-    parser.add_argument('-b', '--beam-size', type=int, default=5,
-                       help='Размер beam search (1-10, default: 5)')
+    parser.add_argument('-b', '--beam-size', type=int, default=None,
+                       help='Размер beam search (1-10, default: FILE_BEAM_SIZE сервера, 1)')
     parser.add_argument('-l', '--language',
                        help='Язык аудио (ru, en, auto, ...)')
     parser.add_argument('--segments', action='store_true',
                        help='Включить временные метки в результат')
-    parser.add_argument('--vad', action='store_true',
-                       help='Включить VAD фильтр для удаления тишины')
+    parser.add_argument('--vad', dest='vad', action='store_true', default=None,
+                       help='Включить VAD фильтр для удаления тишины (default: FILE_VAD_FILTER сервера, включен)')
+    parser.add_argument('--no-vad', dest='vad', action='store_false',
+                       help='Отключить VAD фильтр (если VAD обрезает тихую речь)')
     parser.add_argument('-q', '--quiet', action='store_true',
                        help='Минимальный вывод (только текст)')
+    parser.add_argument('--compress', action='store_true',
+                       help='Сжимать загрузку WAV файлов gzip (для медленных каналов)')
+    parser.add_argument('--raw-pcm', action='store_true',
+                       help='Отправлять PCM данные WAV файлов без контейнера (без разбора WAV на сервере)')
+    parser.add_argument('--no-warmup', action='store_true',
+                       help='Не устанавливать соединение с сервером заранее')
+    parser.add_argument('--concurrency', type=int, default=4,
+                       help='Число одновременных запросов для нескольких файлов (default: 4)')
     
     args = parser.parse_args()
     
+    # Соединение с сервером устанавливается в фоне, пока готовится файл
+    if not args.no_warmup:
+        warmup_connection(args.server)
+    
     try:
+        if len(args.file) > 1:
+            sys.exit(_main_many(args))
+        
         # Выполняем транскрипцию
         result = transcribe_file(
-            file_path=args.file,
+            file_path=args.file[0],
             server_url=args.server,
             output_file=args.output,
             beam_size=args.beam_size,
             language=args.language,
             include_segments=args.segments,
             vad_filter=args.vad,
-            verbose=not args.quiet
+            verbose=not args.quiet,
+            compress=args.compress,
+            raw_pcm=args.raw_pcm
         )
         
         # В quiet режиме выводим только текст
@@ -194,6 +862,8 @@ def main():
         if not args.quiet:
             print(f"\n❌ Ошибка: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        close()
 
 if __name__ == '__main__':
     main()
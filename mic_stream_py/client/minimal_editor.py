@@ -13,89 +13,213 @@
 - Оптимизировано для маленьких терминальных окон
 """
 
+from __future__ import annotations
+
+import array
 import asyncio
+import atexit
 import json
+import math
 import os
 import sys
 import time
 import struct
-import contextlib
-import subprocess
+import ctypes
+import functools
+import platform
+from pathlib import Path
+from typing import Optional
 
-# Основные зависимости
-try:
-    import pyperclip
-    import websockets
-    import pyaudio
-    import struct
-except ImportError as e:
-    print(f"Ошибка импорта зависимостей: {e}")
-    print("Установите зависимости: pip install pyperclip websockets pyaudio")
-    sys.exit(1)
-
-# prompt_toolkit компоненты
 try:
-    from prompt_toolkit import Application
-    from prompt_toolkit.buffer import Buffer
-    from prompt_toolkit.layout import Layout
-    from prompt_toolkit.layout.containers import HSplit, VSplit, Window, ConditionalContainer
-    from prompt_toolkit.layout.controls import BufferControl, FormattedTextControl
-    from prompt_toolkit.key_binding import KeyBindings
-    from prompt_toolkit.styles import Style
-    from prompt_toolkit.formatted_text import FormattedText
-    # Unused imports removed
-    from prompt_toolkit.filters import Condition
-except ImportError as e:
-    print(f"Ошибка импорта prompt_toolkit: {e}")
-    print("Установите prompt_toolkit: pip install prompt_toolkit")
-    sys.exit(1)
-
-
+    # Опциональный быстрый JSON парсер для сообщений сервера (pip install orjson)
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Тяжелые зависимости (prompt_toolkit, PyAudio, websockets, pyperclip) импортируются
+# при создании редактора, а не при импорте модуля: --help и разбор аргументов
+# не платят за их загрузку
+pyperclip = websockets = pyaudio = None
+Application = Buffer = Layout = None
+HSplit = VSplit = Window = ConditionalContainer = None
+BufferControl = FormattedTextControl = KeyBindings = Style = FormattedText = Condition = None
+
+
+@functools.lru_cache(maxsize=1)
+def _import_ui_dependencies() -> None:
+    """Импорт зависимостей редактора в глобальное пространство модуля (один раз)"""
+    global pyperclip, websockets, pyaudio
+    global Application, Buffer, Layout, HSplit, VSplit, Window, ConditionalContainer
+    global BufferControl, FormattedTextControl, KeyBindings, Style, FormattedText, Condition
+
+    # Основные зависимости
+    try:
+        import pyperclip
+        import websockets
+        import pyaudio
+    except ImportError as e:
+        print(f"Ошибка импорта зависимостей: {e}")
+        print("Установите зависимости: pip install pyperclip websockets pyaudio")
+        sys.exit(1)
+
+    # prompt_toolkit компоненты
+    try:
+        from prompt_toolkit import Application
+        from prompt_toolkit.buffer import Buffer
+        from prompt_toolkit.layout import Layout
+        from prompt_toolkit.layout.containers import HSplit, VSplit, Window, ConditionalContainer
+        from prompt_toolkit.layout.controls import BufferControl, FormattedTextControl
+        from prompt_toolkit.key_binding import KeyBindings
+        from prompt_toolkit.styles import Style
+        from prompt_toolkit.formatted_text import FormattedText
+        from prompt_toolkit.filters import Condition
+    except ImportError as e:
+        print(f"Ошибка импорта prompt_toolkit: {e}")
+        print("Установите prompt_toolkit: pip install prompt_toolkit")
+        sys.exit(1)
+
+
+@functools.lru_cache(maxsize=1)
 def load_env_file() -> None:
-    """Загрузка переменных окружения из .env файла"""
+    """Загрузка переменных окружения из .env файла (один раз на процесс)"""
     env_file = os.path.join(os.path.dirname(__file__), ".env")
-    if os.path.exists(env_file):
-        with open(env_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    if '=' in line:
-                        key, value = line.split('=', 1)
-                        os.environ[key.strip()] = value.strip()
+    try:
+        text = Path(env_file).read_text(encoding='utf-8')
+    except OSError:
+        return
+
+    # Разбираем весь файл за один проход и обновляем окружение одним вызовом
+    updates = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line[0] == '#':
+            continue
+        key, sep, value = line.partition('=')
+        if sep:
+            updates[key.strip()] = value.strip()
+    os.environ.update(updates)
 
 
 # Загружаем переменные окружения
 load_env_file()
 
 
+# Обработчик ошибок ALSA должен жить все время работы процесса
+_alsa_error_handler = None
+
+
+def _silence_alsa_errors() -> None:
+    """
+    Однократная установка пустого обработчика ошибок ALSA.
+
+    libasound печатает предупреждения при перечислении устройств PyAudio прямо в stderr.
+    Вместо перехвата дескриптора 2 на время каждой инициализации регистрируем
+    no-op обработчик через snd_lib_error_set_handler - остальной вывод в stderr не теряется.
+    """
+    global _alsa_error_handler
+    try:
+        asound = ctypes.CDLL('libasound.so.2')
+        handler_type = ctypes.CFUNCTYPE(
+            None, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p
+        )
+        _alsa_error_handler = handler_type(lambda *args: None)
+        asound.snd_lib_error_set_handler(_alsa_error_handler)
+    except Exception:
+        # libasound недоступна - предупреждений ALSA тоже не будет
+        pass
+
+
+# Платформа определяется один раз при импорте; на macOS/Windows ALSA нет
+if platform.system() == 'Linux':
+    _silence_alsa_errors()
+
+# Минимальный интервал между проверками выделения для автокопирования (сек)
+SELECTION_CHECK_INTERVAL = 0.1
+
+# Сколько показывается индикатор копирования в статус строке (сек)
+COPY_INDICATOR_DURATION = 1.5
+
+# Заголовок бинарного сообщения: длина метаданных (uint32, little-endian)
+_METADATA_LENGTH = struct.Struct('<I')
+
+
+# Короткие звуковые сигналы (PCM int16, моно) синтезируются один раз при импорте
+_SOUND_SAMPLE_RATE = 16000
+
+
+def _make_blip(frequency: float, duration: float = 0.05, volume: float = 0.3) -> bytes:
+    """Синусоидальный сигнал с плавными краями (без щелчков)"""
+    total = int(_SOUND_SAMPLE_RATE * duration)
+    fade = max(1, total // 10)
+    samples = array.array('h', (
+        int(volume * 32767 * math.sin(2 * math.pi * frequency * i / _SOUND_SAMPLE_RATE)
+            * min(1.0, i / fade, (total - i) / fade))
+        for i in range(total)
+    ))
+    return samples.tobytes()
+
+
+_SOUNDS = {
+    'start': _make_blip(800),
+    'end': _make_blip(1200),
+}
+
+# Один экземпляр PortAudio на процесс: инициализация перечисляет все устройства
+# и заметно дороже открытия потока, поэтому terminate() выполняется только при выходе
+_pyaudio_instance = None
+
+
+def _get_pyaudio():
+    """Ленивое создание общего экземпляра PyAudio"""
+    global _pyaudio_instance
+    if _pyaudio_instance is None:
+        _pyaudio_instance = pyaudio.PyAudio()
+        atexit.register(_terminate_pyaudio)
+    return _pyaudio_instance
+
+
+def _terminate_pyaudio():
+    """Освобождение PortAudio при завершении процесса"""
+    global _pyaudio_instance
+    if _pyaudio_instance is not None:
+        _pyaudio_instance.terminate()
+        _pyaudio_instance = None
+
+
+# Выходной поток открывается при первом звуке и переиспользуется
+_sound_stream = None
+_sound_unavailable = False
+
+
+def _get_sound_stream():
+    """Ленивое открытие общего выходного аудио потока"""
+    global _sound_stream
+    if _sound_stream is None:
+        _sound_stream = _get_pyaudio().open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=_SOUND_SAMPLE_RATE,
+            output=True
+        )
+    return _sound_stream
+
+
 def play_sound(sound_type):
     """
-    Кроссплатформенное воспроизведение системных звуков.
+    Кроссплатформенное воспроизведение звуковых сигналов.
     sound_type: 'start' для начала записи, 'end' для окончания распознавания
     """
-    import platform
-    
-    try:
-        if platform.system() == 'Darwin':  # macOS
-            # Используем macOS нативные звуки
-            sound_file = '/System/Library/Sounds/Ping.aiff'
-            subprocess.run(['afplay', sound_file], 
-                         stdout=subprocess.DEVNULL, 
-                         stderr=subprocess.DEVNULL,
-                         timeout=2)
-        else:  # Linux и другие
-            sound_name = 'bell' if sound_type == 'start' else 'message'
-            result = subprocess.run(
-                ['canberra-gtk-play', '-i', sound_name],
-                stdout=subprocess.DEVNULL, 
-                stderr=subprocess.DEVNULL,
-                timeout=2
-            )
-            if result.returncode == 0:
-                return  # Звук воспроизведен успешно
-    except (subprocess.TimeoutExpired, subprocess.CalledProcessError, FileNotFoundError):
-        pass  # Игнорируем ошибки системных звуков
-    
+    global _sound_unavailable
+
+    if not _sound_unavailable:
+        try:
+            _get_sound_stream().write(_SOUNDS.get(sound_type, _SOUNDS['end']))
+            return
+        except Exception:
+            # Аудио вывод недоступен - больше не пытаемся его открыть
+            _sound_unavailable = True
+
     # Универсальный fallback на терминальный bell
     try:
         print('\a', end='', flush=True)
@@ -106,11 +230,24 @@ def play_sound(sound_type):
 class ClipboardManager:
     """Менеджер для работы с системным буфером обмена"""
 
-    @staticmethod
-    def copy_text(text: str) -> bool:
+    # Повторная запись того же текста в пределах окна пропускается
+    # (на Linux каждая запись - запуск xclip/xsel/wl-copy)
+    DEDUPE_WINDOW = 0.2
+
+    def __init__(self):
+        self._last_text = None
+        self._last_write_time = 0.0
+
+    def copy_text(self, text: str) -> bool:
         """Копирование текста в системный буфер обмена"""
+        now = time.monotonic()
+        if text == self._last_text and now - self._last_write_time < self.DEDUPE_WINDOW:
+            return True
+
         try:
             pyperclip.copy(text)
+            self._last_text = text
+            self._last_write_time = now
             return True
         except Exception as e:
             print(f"Ошибка копирования в буфер: {e}")
@@ -128,71 +265,92 @@ class ClipboardManager:
 class StatusBar:
     """Минимальная статус строка"""
 
+    # Стиль индикатора и текст справа для каждого состояния STT
+    _STATES = {
+        'recognizing': ('class:status-recording', 'class:status-recording', 'Recognizing'),  # идет распознавание
+        'paused': ('class:status-paused', 'class:status-paused', 'Paused'),                   # на паузе
+        'listening': ('class:status-monitoring', 'class:status-connected', 'Listening'),      # мониторит голос
+        'ready': ('class:status-idle', 'class:status-connected', 'Ready'),                    # подключен, не пишет
+        'offline': ('class:status-idle', 'class:status-disconnected', 'Offline'),             # не подключен
+    }
+
+    # Набор состояний конечен, поэтому FormattedText строятся один раз
+    # (при создании первой статус строки), а при перерисовке возвращается готовый объект
+    _LEFT = None
+    _RIGHT = None
+
+    @classmethod
+    def _build_texts(cls) -> None:
+        """Построение FormattedText для всех состояний"""
+        cls._LEFT = {
+            (state, copied): FormattedText(
+                [(indicator_style, '[●] '), ('', 'F1:Help')] + ([('class:status-success', ' ✓')] if copied else [])
+            )
+            for state, (indicator_style, _, _) in cls._STATES.items()
+            for copied in (False, True)
+        }
+        cls._RIGHT = {
+            state: FormattedText([(style, text)])
+            for state, (_, style, text) in cls._STATES.items()
+        }
+
     def __init__(self, editor):
+        if StatusBar._LEFT is None:
+            StatusBar._build_texts()
         self.editor = editor
-        self.last_copy_time = 0
+        # Интервалы считаем по монотонным часам: не зависят от перевода системного времени
+        self.last_copy_time = float('-inf')
 
-    def get_left_status(self) -> FormattedText:
-        """Левая часть статус бара: индикатор + F1:Help"""
-        items = []
-
-        # Индикатор состояния STT
+    def _state(self) -> str:
+        """Текущее состояние STT для индикаторов"""
         stt_client = getattr(self.editor, 'stt_client', None)
-        if stt_client and stt_client.is_connected:
-            if getattr(self.editor, 'current_text', '') and self.editor.current_text.strip():
-                # Красный: идет активное распознавание
-                items.append(('class:status-recording', '[●] '))
-            elif getattr(stt_client, 'is_paused', False):
-                # Оранжевый: на паузе
-                items.append(('class:status-paused', '[●] '))
-            elif stt_client.is_recording:
-                # Зеленый: мониторит голос
-                items.append(('class:status-monitoring', '[●] '))
-            else:
-                # Серый: подключен, но не записывает
-                items.append(('class:status-idle', '[●] '))
-        else:
-            # Серый: не подключен
-            items.append(('class:status-idle', '[●] '))
-
-        # F1:Help + индикатор копирования
-        items.append(('', 'F1:Help'))
-
-        # Индикатор копирования
-        current_time = time.time()
-        if current_time - self.last_copy_time < 1.5:
-            items.append(('class:status-success', ' ✓'))
+        if not (stt_client and stt_client.is_connected):
+            return 'offline'
+        if getattr(self.editor, 'current_text', '') and self.editor.current_text.strip():
+            return 'recognizing'
+        if getattr(stt_client, 'is_paused', False):
+            return 'paused'
+        if stt_client.is_recording:
+            return 'listening'
+        return 'ready'
 
-        return FormattedText(items)
+    def get_left_status(self) -> FormattedText:
+        """Левая часть статус бара: индикатор + F1:Help + индикатор копирования"""
+        copied = time.monotonic() - self.last_copy_time < COPY_INDICATOR_DURATION
+        return self._LEFT[self._state(), copied]
 
     def get_right_status(self) -> FormattedText:
         """Правая часть статус бара: состояние STT"""
-        items = []
-
-        stt_client = getattr(self.editor, 'stt_client', None)
-        if stt_client and stt_client.is_connected:
-            if getattr(self.editor, 'current_text', '') and self.editor.current_text.strip():
-                items.append(('class:status-recording', 'Recognizing'))
-            elif getattr(stt_client, 'is_paused', False):
-                items.append(('class:status-paused', 'Paused'))
-            elif stt_client.is_recording:
-                items.append(('class:status-connected', 'Listening'))
-            else:
-                items.append(('class:status-connected', 'Ready'))
-        else:
-            items.append(('class:status-disconnected', 'Offline'))
-
-        return FormattedText(items)
+        return self._RIGHT[self._state()]
 
     def show_copy_indicator(self):
         """Показать индикатор копирования"""
-        self.last_copy_time = time.time()
+        self.last_copy_time = time.monotonic()
+
+        # Периодической перерисовки нет: скрытие индикатора планируем отдельно
+        app = getattr(self.editor, 'app', None)
+        if app is not None:
+            app.invalidate()
+            try:
+                asyncio.get_running_loop().call_later(COPY_INDICATOR_DURATION, app.invalidate)
+            except RuntimeError:
+                pass
 
 
 class WebSocketSTTClient:
     """Асинхронный WebSocket клиент для STT сервера"""
 
+    # Атрибуты читаются на каждом аудио чанке: слоты вместо __dict__
+    __slots__ = (
+        'editor', 'control_url', 'data_url',
+        'control_ws', 'data_ws', 'is_connected',
+        'audio_format', 'channels', 'sample_rate', 'chunk_size', 'audio_stream', 'pyaudio_instance',
+        '_frame_buffer', '_audio_queue', '_loop', '_capture_start_time', '_samples_captured',
+        'is_recording', 'is_paused', 'should_exit',
+    )
+
     def __init__(self, editor):
+        _import_ui_dependencies()
         self.editor = editor
         self.control_url = os.getenv('CONTROL_URL', 'ws://genaminipc.awg:8011')
         self.data_url = os.getenv('DATA_URL', 'ws://genaminipc.awg:8012')
@@ -209,28 +367,21 @@ class WebSocketSTTClient:
         self.chunk_size = 1024
         self.audio_stream = None
         self.pyaudio_instance = None
+        # Переиспользуемый буфер для бинарных сообщений с аудио
+        self._frame_buffer = bytearray()
+        # Чанки из callback потока PortAudio передаются в event loop через очередь
+        self._audio_queue = None
+        self._loop = None
+        # Время чанка считаем по числу захваченных сэмплов от начала записи,
+        # а не читаем часы на каждый чанк
+        self._capture_start_time = 0.0
+        self._samples_captured = 0
 
         # Состояние
         self.is_recording = False
         self.is_paused = False  # Состояние паузы записи
         self.should_exit = False
 
-    @contextlib.contextmanager
-    def suppress_alsa_warnings(self):
-        """Подавление ALSA warnings"""
-        try:
-            # Подавляем ALSA error output
-            with open(os.devnull, 'w') as devnull:
-                old_stderr = os.dup(2)
-                os.dup2(devnull.fileno(), 2)
-                try:
-                    yield
-                finally:
-                    os.dup2(old_stderr, 2)
-                    os.close(old_stderr)
-        except Exception:
-            yield
-
     async def connect(self):
         """Подключение к WebSocket серверам"""
         try:
@@ -249,6 +400,7 @@ class WebSocketSTTClient:
             )
 
             self.is_connected = True
+            self._state_changed()
 
             # Запуск обработчика сообщений
             asyncio.create_task(self.message_handler())
@@ -258,12 +410,16 @@ class WebSocketSTTClient:
 
         except Exception as e:
             self.is_connected = False
+            self._state_changed()
             raise e
 
     async def disconnect(self):
         """Отключение от WebSocket серверов"""
         self.should_exit = True
         self.is_connected = False
+        self.is_recording = False
+        self._wake_capture_task()
+        self._state_changed()
 
         if self.control_ws:
             await self.control_ws.close()
@@ -273,8 +429,38 @@ class WebSocketSTTClient:
         if self.audio_stream:
             self.audio_stream.stop_stream()
             self.audio_stream.close()
-        if self.pyaudio_instance:
-            self.pyaudio_instance.terminate()
+            self.audio_stream = None
+
+    def _state_changed(self):
+        """Перерисовка статус строки после смены состояния (периодического опроса нет)"""
+        app = getattr(self.editor, 'app', None)
+        if app is not None:
+            app.invalidate()
+
+    def _open_input_stream(self):
+        """Открытие входного потока в callback режиме (PortAudio читает в своем потоке)"""
+        return self.pyaudio_instance.open(
+            format=self.audio_format,
+            channels=self.channels,
+            rate=self.sample_rate,
+            input=True,
+            frames_per_buffer=self.chunk_size,
+            stream_callback=self._audio_callback
+        )
+
+    def _audio_callback(self, in_data, frame_count, time_info, status):
+        """Callback PortAudio: передает чанк в event loop без блокировки"""
+        try:
+            self._loop.call_soon_threadsafe(self._audio_queue.put_nowait, in_data)
+        except RuntimeError:
+            # Event loop уже закрыт - завершаем поток
+            return (None, pyaudio.paComplete)
+        return (None, pyaudio.paContinue)
+
+    def _wake_capture_task(self):
+        """Разбудить задачу захвата, чтобы она завершилась"""
+        if self._audio_queue is not None:
+            self._audio_queue.put_nowait(None)
 
     async def start_recording(self):
         """Начало записи аудио"""
@@ -282,29 +468,17 @@ class WebSocketSTTClient:
             return
 
         try:
-            # Кроссплатформенная инициализация PyAudio
-            import platform
-            if platform.system() == 'Darwin':  # macOS
-                self.pyaudio_instance = pyaudio.PyAudio()
-                self.audio_stream = self.pyaudio_instance.open(
-                    format=self.audio_format,
-                    channels=self.channels,
-                    rate=self.sample_rate,
-                    input=True,
-                    frames_per_buffer=self.chunk_size
-                )
-            else:  # Linux и другие
-                with self.suppress_alsa_warnings():
-                    self.pyaudio_instance = pyaudio.PyAudio()
-                    self.audio_stream = self.pyaudio_instance.open(
-                        format=self.audio_format,
-                        channels=self.channels,
-                        rate=self.sample_rate,
-                        input=True,
-                        frames_per_buffer=self.chunk_size
-                    )
+            self._loop = asyncio.get_running_loop()
+            self._audio_queue = asyncio.Queue()
+            self._capture_start_time = time.time()
+            self._samples_captured = 0
+
+            # Общий экземпляр PyAudio (ALSA warnings подавлены при импорте модуля)
+            self.pyaudio_instance = _get_pyaudio()
+            self.audio_stream = self._open_input_stream()
 
             self.is_recording = True
+            self._state_changed()
 
             # Отправка команды начала записи
             if self.control_ws:
@@ -321,6 +495,7 @@ class WebSocketSTTClient:
 
         except Exception:
             self.is_recording = False
+            self._state_changed()
 
     async def stop_recording(self):
         """Остановка записи аудио"""
@@ -328,29 +503,15 @@ class WebSocketSTTClient:
             return
 
         self.is_recording = False
+        self._wake_capture_task()
+        self._state_changed()
 
         try:
-            # Кроссплатформенная остановка аудио потока
-            import platform
-            if platform.system() == 'Darwin':  # macOS
-                if self.audio_stream:
-                    self.audio_stream.stop_stream()
-                    self.audio_stream.close()
-                    self.audio_stream = None
-
-                if self.pyaudio_instance:
-                    self.pyaudio_instance.terminate()
-                    self.pyaudio_instance = None
-            else:  # Linux и другие
-                with self.suppress_alsa_warnings():
-                    if self.audio_stream:
-                        self.audio_stream.stop_stream()
-                        self.audio_stream.close()
-                        self.audio_stream = None
-
-                    if self.pyaudio_instance:
-                        self.pyaudio_instance.terminate()
-                        self.pyaudio_instance = None
+            # Остановка аудио потока (сам PyAudio остается открытым до выхода)
+            if self.audio_stream:
+                self.audio_stream.stop_stream()
+                self.audio_stream.close()
+                self.audio_stream = None
 
             # Отправка команды остановки
             if self.control_ws:
@@ -367,7 +528,12 @@ class WebSocketSTTClient:
             return
 
         self.is_paused = True
+        self._state_changed()
         try:
+            # Поток не закрываем: на паузе PortAudio просто перестает вызывать callback
+            if self.audio_stream:
+                self.audio_stream.stop_stream()
+
             # Отправка команды паузы
             if self.control_ws:
                 await self.control_ws.send(json.dumps({
@@ -382,7 +548,14 @@ class WebSocketSTTClient:
             return
 
         self.is_paused = False
+        self._state_changed()
         try:
+            # Захват возобновляется с новой точки отсчета времени чанков
+            self._capture_start_time = time.time()
+            self._samples_captured = 0
+            if self.audio_stream:
+                self.audio_stream.start_stream()
+
             # Отправка команды возобновления
             if self.control_ws:
                 await self.control_ws.send(json.dumps({
@@ -393,22 +566,28 @@ class WebSocketSTTClient:
 
     async def audio_capture_task(self):
         """Задача захвата аудио данных"""
-        while self.is_recording and self.audio_stream:
+        queue = self._audio_queue
+        bytes_per_frame = 2 * self.channels  # paInt16
+        while self.is_recording:
             try:
-                # Чтение аудио данных
-                audio_data = self.audio_stream.read(self.chunk_size, exception_on_overflow=False)
+                # Ждем чанк от callback'а PortAudio; None - сигнал остановки
+                audio_data = await queue.get()
+                if audio_data is None:
+                    break
+
+                # Метка времени соответствует моменту захвата чанка
+                timestamp = self._capture_start_time + self._samples_captured / self.sample_rate
+                self._samples_captured += len(audio_data) // bytes_per_frame
 
                 # Отправка на сервер только если не на паузе
                 if not self.is_paused:
-                    await self.send_audio_chunk(audio_data)
-
-                await asyncio.sleep(0.01)  # Небольшая пауза
+                    await self.send_audio_chunk(audio_data, timestamp)
 
             except Exception as e:
                 print(f"Ошибка захвата аудио: {e}")
                 break
 
-    async def send_audio_chunk(self, audio_data):
+    async def send_audio_chunk(self, audio_data, timestamp: Optional[float] = None):
         """Отправка аудио чанка на сервер с метаданными."""
         if not self.data_ws:
             return
@@ -417,16 +596,25 @@ class WebSocketSTTClient:
             # Подготовка метаданных
             metadata = {
                 'sampleRate': self.sample_rate,
-                'timestamp': time.time()
+                'timestamp': time.time() if timestamp is None else timestamp
             }
             metadata_json = json.dumps(metadata).encode('utf-8')
-            metadata_length = len(metadata_json)
 
             # Создание сообщения: [length][metadata][audio_data]
-            message = struct.pack('<I', metadata_length) + metadata_json + audio_data
-
-            # Отправка на сервер
-            await self.data_ws.send(message)
+            # Пишем в заранее выделенный буфер, чтобы не создавать новый bytes на каждый чанк
+            header_end = _METADATA_LENGTH.size + len(metadata_json)
+            frame_end = header_end + len(audio_data)
+            if len(self._frame_buffer) < frame_end:
+                # Новый буфер вместо resize: старый мог остаться экспортированным через memoryview
+                self._frame_buffer = bytearray(frame_end * 2)
+            frame = self._frame_buffer
+            _METADATA_LENGTH.pack_into(frame, 0, len(metadata_json))
+            frame[_METADATA_LENGTH.size:header_end] = metadata_json
+            frame[header_end:frame_end] = audio_data
+
+            # Отправка на сервер (websockets копирует данные при формировании фрейма)
+            with memoryview(frame) as view:
+                await self.data_ws.send(view[:frame_end])
 
         except Exception:
             pass
@@ -438,7 +626,7 @@ class WebSocketSTTClient:
                 async for message in self.data_ws:
                     if isinstance(message, str):
                             try:
-                                data = json.loads(message)
+                                data = _json_loads(message)
                                 msg_type = data.get('type')
 
                                 if msg_type == 'realtime':
@@ -458,9 +646,11 @@ class WebSocketSTTClient:
 
                                 elif msg_type == 'recording_start':
                                     self.is_recording = True
+                                    self._state_changed()
 
                                 elif msg_type == 'recording_stop':
                                     self.is_recording = False
+                                    self._state_changed()
 
                             except json.JSONDecodeError:
                                 pass
@@ -473,11 +663,18 @@ class MinimalSTTEditor:
     """Основной класс минималистичного STT редактора"""
 
     def __init__(self):
+        _import_ui_dependencies()
+
         # Основной текстовый буфер
         self.buffer = Buffer(multiline=True)
 
-        # Отслеживание предыдущего состояния выделения для автокопирования
-        self.last_selection_hash = None
+        # Отслеживание предыдущего состояния выделения для автокопирования:
+        # (позиция курсора, начало выделения, длина текста) - сравнение за O(1)
+        self.last_selection_key = None
+        # Время последней проверки выделения (проверка не чаще SELECTION_CHECK_INTERVAL)
+        self._last_selection_check = 0.0
+        # Отложенная проверка выделения после пропущенной (чтобы не потерять последнее изменение)
+        self._selection_check_handle = None
 
         # Менеджеры
         self.clipboard_manager = ClipboardManager()
@@ -569,7 +766,8 @@ class MinimalSTTEditor:
             style=self.style,
             full_screen=True,
             mouse_support=True,  # Поддержка мыши
-            refresh_interval=0.1,  # Увеличили частоту для лучшего отслеживания выделения
+            # Без refresh_interval: перерисовка только по событиям (ввод, изменение буфера,
+            # смена состояния STT, истечение индикатора копирования)
             on_invalidate=self.on_app_invalidate  # Обработчик обновлений
         )
 
@@ -677,21 +875,47 @@ class MinimalSTTEditor:
 
     def check_selection_change(self):
         """Проверка изменений в выделении и автокопирование"""
-        if self.buffer.selection_state:
-            # Есть выделение
+        # Перерисовки идут пачками (ввод, realtime текст, таймер) - выделение
+        # достаточно проверять не чаще одного раза за интервал обновления
+        now = time.monotonic()
+        elapsed = now - self._last_selection_check
+        if elapsed < SELECTION_CHECK_INTERVAL:
+            # Периодической перерисовки нет - проверяем еще раз по окончании интервала
+            if self._selection_check_handle is None:
+                try:
+                    self._selection_check_handle = asyncio.get_running_loop().call_later(
+                        SELECTION_CHECK_INTERVAL - elapsed, self._deferred_selection_check
+                    )
+                except RuntimeError:
+                    pass
+            return
+        self._last_selection_check = now
+
+        selection_state = self.buffer.selection_state
+        if selection_state:
+            # Есть выделение: границы не изменились - текст не извлекаем
+            selection_key = (
+                self.buffer.cursor_position,
+                selection_state.original_cursor_position,
+                len(self.buffer.text)
+            )
+            if selection_key == self.last_selection_key:
+                return
+            self.last_selection_key = selection_key
+
+            # Выделение изменилось - копируем в буфер
             selected_text = self.buffer.copy_selection()
             if selected_text and selected_text.text.strip():
-                # Вычисляем хеш выделенного текста
-                selection_hash = hash(selected_text.text.strip())
-
-                # Если выделение изменилось, копируем в буфер
-                if self.last_selection_hash != selection_hash:
-                    if self.clipboard_manager.copy_text(selected_text.text):
-                        self.status_bar.show_copy_indicator()
-                    self.last_selection_hash = selection_hash
+                if self.clipboard_manager.copy_text(selected_text.text):
+                    self.status_bar.show_copy_indicator()
         else:
-            # Нет выделения - сбрасываем хеш
-            self.last_selection_hash = None
+            # Нет выделения - сбрасываем ключ
+            self.last_selection_key = None
+
+    def _deferred_selection_check(self):
+        """Отложенная проверка выделения"""
+        self._selection_check_handle = None
+        self.check_selection_change()
 
     async def toggle_recording_pause(self):
         """Переключение паузы/возобновления STT записи"""
@@ -718,12 +942,10 @@ class MinimalSTTEditor:
             self.current_text = text.strip()
 
             # Добавляем новый realtime текст если он не пустой
+            # (изменение буфера само запрашивает перерисовку)
             if self.current_text:
                 self.add_realtime_text(self.current_text)
 
-            # Обновляем интерфейс
-            self.app.invalidate()
-
     async def on_stt_text_received(self, text: str, is_final: bool):
         """Обработка текста от STT сервера"""
         if is_final and text.strip():
@@ -740,9 +962,6 @@ class MinimalSTTEditor:
                 # Звуковой сигнал окончания распознавания
                 play_sound('end')
 
-            # Принудительная перерисовка буфера
-            self.app.invalidate()
-
     def add_realtime_text(self, text: str):
         """Добавление промежуточного текста"""
         if text.strip():
@@ -765,10 +984,9 @@ class MinimalSTTEditor:
             chars_to_delete = current_pos - self.realtime_start_pos
 
             if chars_to_delete > 0:
-                # Перемещаем курсор назад и удаляем символы
+                # Перемещаем курсор назад и удаляем символы одной операцией
                 self.buffer.cursor_position = self.realtime_start_pos
-                for _ in range(chars_to_delete):
-                    self.buffer.delete()
+                self.buffer.delete(count=chars_to_delete)
 
             self.realtime_start_pos = None
 
@@ -825,17 +1043,22 @@ class MinimalSTTEditor:
             await self.cleanup()
 
 
-async def main():
-    """Главная функция"""
-    import argparse
+async def main(test: Optional[bool] = None):
+    """
+    Главная функция.
+
+    test: тестовый режим; если не передан, берется из аргументов командной строки
+    """
+    if test is None:
+        import argparse
 
-    parser = argparse.ArgumentParser(description="Минималистичный STT редактор")
-    parser.add_argument('--test', action='store_true', help='Тестовый режим (показать интерфейс и выйти)')
-    args = parser.parse_args()
+        parser = argparse.ArgumentParser(description="Минималистичный STT редактор")
+        parser.add_argument('--test', action='store_true', help='Тестовый режим (показать интерфейс и выйти)')
+        test = parser.parse_args().test
 
     editor = MinimalSTTEditor()
 
-    if args.test:
+    if test:
         # Тестовый режим - включаем вывод
         editor._initialization_output = True
         await editor.initialize()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Тест поиска PCM16 данных в WAV файлах (_find_wav_pcm).
+Проверяет обход RIFF чанков без сети и сервера.
+"""
+
+import io
+import struct
+import sys
+from pathlib import Path
+
+# Добавляем текущую директорию в путь для импорта
+sys.path.insert(0, str(Path(__file__).parent))
+
+from file_transcribe_client import _find_wav_pcm  # noqa: E402
+
+PCM = b'\x01\x00\x02\x00\x03\x00\x04\x00'
+
+
+def _chunk(chunk_id: bytes, payload: bytes) -> bytes:
+    """RIFF чанк с выравнивающим байтом для нечетного размера."""
+    pad = b'\0' if len(payload) & 1 else b''
+    return struct.pack('<4sI', chunk_id, len(payload)) + payload + pad
+
+
+def _fmt(format_tag: int = 1, channels: int = 1, sample_rate: int = 16000, bits: int = 16) -> bytes:
+    """Чанк fmt (для WAVE_FORMAT_EXTENSIBLE - с расширенной частью)."""
+    block_align = channels * bits // 8
+    payload = struct.pack('<HHIIHH', format_tag, channels, sample_rate,
+                          sample_rate * block_align, block_align, bits)
+    if format_tag == 0xFFFE:
+        # cbSize, valid bits, channel mask, GUID подформата KSDATAFORMAT_SUBTYPE_PCM
+        payload += struct.pack('<HHI', 22, bits, 0x4)
+        payload += b'\x01\x00\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+    return _chunk(b'fmt ', payload)
+
+
+def _wav(*chunks: bytes) -> bytes:
+    """WAV файл из готовых чанков."""
+    body = b'WAVE' + b''.join(chunks)
+    return struct.pack('<4sI', b'RIFF', len(body)) + body
+
+
+def _find(data: bytes):
+    return _find_wav_pcm(io.BytesIO(data), len(data))
+
+
+def _expected_offset(data: bytes) -> int:
+    return data.index(b'data') + 8
+
+
+def test_plain_pcm():
+    data = _wav(_fmt(), _chunk(b'data', PCM))
+    assert _find(data) == (16000, 1, _expected_offset(data), len(PCM))
+
+
+def test_list_chunk_before_data():
+    info = _chunk(b'LIST', b'INFOISFT\x05\x00\x00\x00test\x00')
+    data = _wav(_fmt(channels=2, sample_rate=48000), info, _chunk(b'data', PCM))
+    assert _find(data) == (48000, 2, _expected_offset(data), len(PCM))
+
+
+def test_odd_sized_chunk_padding():
+    # Нечетный чанк дополнен байтом: без учета выравнивания data не найдется
+    data = _wav(_fmt(), _chunk(b'junk', b'abc'), _chunk(b'data', PCM))
+    assert _find(data) == (16000, 1, _expected_offset(data), len(PCM))
+
+
+def test_wave_format_extensible():
+    data = _wav(_fmt(format_tag=0xFFFE), _chunk(b'data', PCM))
+    assert _find(data) == (16000, 1, _expected_offset(data), len(PCM))
+
+
+def test_non_16_bit_is_rejected():
+    assert _find(_wav(_fmt(bits=24), _chunk(b'data', PCM[:6]))) is None
+    assert _find(_wav(_fmt(format_tag=3, bits=32), _chunk(b'data', PCM))) is None
+
+
+def test_not_wav_is_rejected():
+    assert _find(b'ID3\x03' + b'\0' * 40) is None
+
+
+def test_truncated_fmt_is_rejected():
+    # fmt короче 16 байт и файл, обрезанный посреди fmt
+    assert _find(_wav(_chunk(b'fmt ', b'\x01\x00\x01\x00'), _chunk(b'data', PCM))) is None
+    assert _find(_wav(_fmt())[:30]) is None
+
+
+if __name__ == '__main__':
+    tests = [value for name, value in sorted(globals().items()) if name.startswith('test_')]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -4,108 +4,122 @@
 """
 
 import os
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+# Допустимые написания булевых значений
+_BOOL_TRUE = frozenset(('true', '1', 'yes', 'on'))
+_BOOL_FALSE = frozenset(('false', '0', 'no', 'off'))
+
+# Значения, которые считаются "не задано" для опциональных параметров
+_NONE_VALUES = frozenset(('none', 'null', 'auto'))
+
+
+def _parse_bool(value: str) -> bool:
+    """Разбор булевого значения."""
+    value_lower = value.strip().lower()
+    if value_lower in _BOOL_TRUE:
+        return True
+    if value_lower in _BOOL_FALSE:
+        return False
+    raise ValueError(value)
+
+
+def _parse_optional(value: str) -> Optional[str]:
+    """Разбор опционального строкового значения."""
+    return None if value.strip().lower() in _NONE_VALUES else value
+
+
+# Разбор значения по типу параметра; ValueError - неверное значение
+_PARSERS: Dict[str, Callable[[str], Any]] = {
+    'str': str,
+    'int': int,
+    'float': float,
+    'bool': _parse_bool,
+    'optional': _parse_optional,
+}
+
+# Схема конфигурации: (ключ, переменная окружения, тип, значение по умолчанию).
+# Все значения имеют разумные значения по умолчанию, соответствующие .env.example,
+# поэтому .env файл не обязателен.
+CONFIG_SCHEMA: Tuple[Tuple[str, str, str, Any], ...] = (
+    # Основные параметры модели
+    ("model", "WHISPER_MODEL", 'str', "medium"),  # Модель Whisper
+    ("language", "LANGUAGE", 'optional', None),  # Автоопределение языка как в micPy проекте
+    ("realtime_model_type", "REALTIME_MODEL_TYPE", 'str', "tiny"),  # Модель для real-time
+    ("device", "DEVICE", 'str', "cuda"),  # Устройство вычислений
+    ("compute_type", "COMPUTE_TYPE", 'optional', None),  # Тип вычислений моделей recorder (auto = default CTranslate2)
+    
+    # Настройки транскрипции
+    ("enable_realtime_transcription", "ENABLE_REALTIME_TRANSCRIPTION", 'bool', True),
+    ("silero_use_onnx", "SILERO_USE_ONNX", 'bool', True),
+    
+    # Настройки VAD (Voice Activity Detection) - увеличены для лучшего качества
+    ("silero_sensitivity", "SILERO_SENSITIVITY", 'float', 0.05),  # 0.0-1.0
+    ("webrtc_sensitivity", "WEBRTC_SENSITIVITY", 'int', 3),  # 1-4
+    ("post_speech_silence_duration", "POST_SPEECH_SILENCE_DURATION", 'float', 1.5),  # Увеличено с 0.7 до 1.5
+    ("min_length_of_recording", "MIN_LENGTH_OF_RECORDING", 'float', 2.0),  # Увеличено с 1.1 до 2.0
+    ("energy_gate", "ENERGY_GATE", 'bool', False),  # Заменять тихие чанки нулями до VAD (экономит Silero)
+    
+    # Настройки качества распознавания (оптимальные баланса качества и скорости)
+    ("beam_size", "BEAM_SIZE", 'int', 5),  # Оптимальный баланс качества и скорости
+    ("beam_size_realtime", "BEAM_SIZE_REALTIME", 'int', 5),  # Увеличено для real-time
+    ("realtime_processing_pause", "REALTIME_PROCESSING_PAUSE", 'float', 0.02),
+    
+    # Промпт для улучшения качества (IT-ориентированный)
+    ("initial_prompt", "INITIAL_PROMPT", 'str',
+        "Текст содержит технические термины на английском в русской речи. "
+        "IT термины: git push, commit, debug, deploy, server, API, frontend, backend, "
+        "Docker, микросервисы, фреймворк, библиотека, код, реакт, веб-разработка. "
+        "Незаконченные мысли: '...'. Примеры: 'Делаю коммит кода', 'Запускаю тесты сервера'."),
+    
+    # Сетевые порты
+    ("control_port", "CONTROL_PORT", 'int', 8011),  # Порт управления
+    ("data_port", "DATA_PORT", 'int', 8012),  # Порт данных
+    ("http_port", "HTTP_PORT", 'int', 8013),  # HTTP API порт для загрузки файлов
+    
+    # HTTP API настройки
+    ("max_file_size_mb", "MAX_FILE_SIZE_MB", 'int', 500),  # Максимальный размер файла в MB
+    ("file_model", "FILE_MODEL", 'str', "large"),  # Модель для обработки файлов (large для качества)
+    ("file_compute_type", "FILE_COMPUTE_TYPE", 'optional', None),  # Тип вычислений модели файлов (auto = по устройству)
+    ("file_beam_size", "FILE_BEAM_SIZE", 'int', 1),  # beam_size по умолчанию для файлов (1 = greedy, быстрее)
+    ("file_vad_filter", "FILE_VAD_FILTER", 'bool', True),  # VAD фильтр по умолчанию для файлов (вырезает тишину)
+    ("file_batch_size", "FILE_BATCH_SIZE", 'int', 1),  # Батч по умолчанию для файлов (1 = без батчинга)
+    ("file_device_index", "FILE_DEVICE_INDEX", 'int', 0),  # Номер GPU для модели файлов
+    ("file_flash_attention", "FILE_FLASH_ATTENTION", 'bool', False),  # Flash attention (CTranslate2 >= 4.4, Ampere+)
+    ("file_queue_size", "FILE_QUEUE_SIZE", 'int', 8),  # Максимум запросов в очереди и в работе (сверх - 503)
+)
+
 
 class EnvConfig:
     """Класс для загрузки конфигурации из переменных окружения."""
     
-    def __init__(self):
-        self.config = self._load_config()
+    def __init__(self, environ: Optional[Mapping[str, str]] = None):
+        """
+        Args:
+            environ: Источник переменных (по умолчанию снимок os.environ на момент создания)
+        """
+        self.config = self._load_config(dict(os.environ) if environ is None else environ)
     
-    def _load_config(self) -> Dict[str, Any]:
+    def _load_config(self, environ: Mapping[str, str]) -> Dict[str, Any]:
         """
-        Загрузка конфигурации из переменных окружения.
+        Загрузка конфигурации из переменных окружения по схеме CONFIG_SCHEMA.
         
-        Все значения имеют разумные значения по умолчанию,
-        соответствующие .env.example, поэтому .env файл не обязателен.
+        Окружение читается один раз при создании; неверные значения заменяются
+        значениями по умолчанию с предупреждением.
         """
-        return {
-            # Основные параметры модели
-            "model": self._get_env("WHISPER_MODEL", "medium"),  # Модель Whisper
-            "language": self._get_env_optional("LANGUAGE", None),  # Автоопределение языка как в micPy проекте
-            "realtime_model_type": self._get_env("REALTIME_MODEL_TYPE", "tiny"),  # Модель для real-time
-            "device": self._get_env("DEVICE", "cuda"),  # Устройство вычислений
-            
-            # Настройки транскрипции
-            "enable_realtime_transcription": self._get_env_bool("ENABLE_REALTIME_TRANSCRIPTION", True),
-            "silero_use_onnx": self._get_env_bool("SILERO_USE_ONNX", True),
-            
-            # Настройки VAD (Voice Activity Detection) - увеличены для лучшего качества
-            "silero_sensitivity": self._get_env_float("SILERO_SENSITIVITY", 0.05),  # 0.0-1.0
-            "webrtc_sensitivity": self._get_env_int("WEBRTC_SENSITIVITY", 3),  # 1-4
-            "post_speech_silence_duration": self._get_env_float("POST_SPEECH_SILENCE_DURATION", 1.5),  # Увеличено с 0.7 до 1.5
-            "min_length_of_recording": self._get_env_float("MIN_LENGTH_OF_RECORDING", 2.0),  # Увеличено с 1.1 до 2.0
-            
-            # Настройки качества распознавания (оптимальные баланса качества и скорости)
-            "beam_size": self._get_env_int("BEAM_SIZE", 5),  # Оптимальный баланс качества и скорости
-            "beam_size_realtime": self._get_env_int("BEAM_SIZE_REALTIME", 5),  # Увеличено для real-time
-            "realtime_processing_pause": self._get_env_float("REALTIME_PROCESSING_PAUSE", 0.02),
-            
-            # Промпт для улучшения качества (IT-ориентированный)
-            "initial_prompt": self._get_env("INITIAL_PROMPT", 
-                "Текст содержит технические термины на английском в русской речи. "
-                "IT термины: git push, commit, debug, deploy, server, API, frontend, backend, "
-                "Docker, микросервисы, фреймворк, библиотека, код, реакт, веб-разработка. "
-                "Незаконченные мысли: '...'. Примеры: 'Делаю коммит кода', 'Запускаю тесты сервера'."
-            ),
-            
-            # Сетевые порты
-            "control_port": self._get_env_int("CONTROL_PORT", 8011),  # Порт управления
-            "data_port": self._get_env_int("DATA_PORT", 8012),  # Порт данных
-            "http_port": self._get_env_int("HTTP_PORT", 8013),  # HTTP API порт для загрузки файлов
-            
-            # HTTP API настройки
-            "max_file_size_mb": self._get_env_int("MAX_FILE_SIZE_MB", 500),  # Максимальный размер файла в MB
-            "file_model": self._get_env("FILE_MODEL", "large"),  # Модель для обработки файлов (large для качества)
-        }
-    
-    def _get_env(self, key: str, default: str) -> str:
-        """Получение строкового значения из переменной окружения."""
-        return os.getenv(key, default)
-    
-    def _get_env_int(self, key: str, default: int) -> int:
-        """Получение целочисленного значения из переменной окружения."""
-        try:
-            value = os.getenv(key)
-            if value is None:
-                return default
-            return int(value)
-        except ValueError:
-            print(f"Предупреждение: Неверное значение для {key}, используется значение по умолчанию: {default}")
-            return default
-    
-    def _get_env_float(self, key: str, default: float) -> float:
-        """Получение вещественного значения из переменной окружения."""
-        try:
-            value = os.getenv(key)
+        config = {}
+        for key, env_name, kind, default in CONFIG_SCHEMA:
+            value = environ.get(env_name)
             if value is None:
-                return default
-            return float(value)
-        except ValueError:
-            print(f"Предупреждение: Неверное значение для {key}, используется значение по умолчанию: {default}")
-            return default
-    
-    def _get_env_bool(self, key: str, default: bool) -> bool:
-        """Получение булевого значения из переменной окружения."""
-        value = os.getenv(key)
-        if value is None:
-            return default
-        
-        value_lower = value.lower()
-        if value_lower in ('true', '1', 'yes', 'on'):
-            return True
-        elif value_lower in ('false', '0', 'no', 'off'):
-            return False
-        else:
-            print(f"Предупреждение: Неверное значение для {key}, используется значение по умолчанию: {default}")
-            return default
-    
-    def _get_env_optional(self, key: str, default=None):
-        """Получение опционального значения из переменной окружения."""
-        value = os.getenv(key)
-        if value is None or value.lower() in ('none', 'null', 'auto'):
-            return default
-        return value
+                config[key] = default
+                continue
+            try:
+                parsed = _PARSERS[kind](value)
+            except ValueError:
+                print(f"Предупреждение: Неверное значение для {env_name}, используется значение по умолчанию: {default}")
+                parsed = default
+            config[key] = default if parsed is None else parsed
+        return config
     
     def get(self, key: str, default=None):
         """Получение значения параметра."""
@@ -4,19 +4,155 @@
 Используется для обработки загруженных файлов через HTTP API.
 """
 
+import io
 import os
+import shutil
 import tempfile
+import time
 import logging
-from pathlib import Path
-from typing import Optional, Dict, Any, Union
+import subprocess
+from math import gcd
+from typing import Optional, Dict, Any, Callable, Union
 import numpy as np
 
+try:
+    from scipy.signal import resample_poly
+except ImportError:
+    resample_poly = None
+
+try:
+    # Декодер faster-whisper (PyAV/libav внутри процесса, без subprocess)
+    from faster_whisper import decode_audio as _pyav_decode
+except ImportError:
+    _pyav_decode = None
+
 logger = logging.getLogger('FileTranscriber')
 
+# ffmpeg декодирует и ресамплирует в PCM16 моно 16kHz прямо в pipe, без временного WAV
+_FFMPEG = shutil.which('ffmpeg')
+_FFMPEG_OUTPUT_ARGS = ('-f', 's16le', '-ac', '1', '-ar', '16000', '-loglevel', 'error', 'pipe:1')
+
+
+# Предпочтительные типы вычислений CTranslate2 по устройству, от быстрого к запасному.
+# int8_float16: веса INT8 (вдвое меньше VRAM), активации FP16 - на GPU с INT8 tensor cores
+_PREFERRED_COMPUTE_TYPES = {
+    'cuda': ('int8_float16', 'float16', 'float32'),
+    'cpu': ('int8', 'float32'),
+}
+
+
+def _resolve_compute_type(device: str) -> str:
+    """Выбор самого быстрого типа вычислений, поддерживаемого устройством."""
+    try:
+        import ctranslate2
+        supported = ctranslate2.get_supported_compute_types(device)
+    except Exception as e:
+        logger.warning(f"Не удалось определить поддерживаемые типы вычислений: {e}")
+        return "auto"
+    
+    for compute_type in _PREFERRED_COMPUTE_TYPES.get(device, ()):
+        if compute_type in supported:
+            return compute_type
+    return "auto"
+
+
+def _ffmpeg_decode(source: Union[str, bytes]) -> np.ndarray:
+    """
+    Декодирование аудио через ffmpeg в float32 массив 16kHz моно.
+    
+    Args:
+        source: Путь к файлу или байты файла (передаются ffmpeg через stdin)
+    """
+    if isinstance(source, bytes):
+        cmd = [_FFMPEG, '-i', 'pipe:0', *_FFMPEG_OUTPUT_ARGS]
+        stdin_data = source
+    else:
+        cmd = [_FFMPEG, '-nostdin', '-i', source, *_FFMPEG_OUTPUT_ARGS]
+        stdin_data = None
+    
+    proc = subprocess.run(cmd, input=stdin_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg: {proc.stderr.decode('utf-8', 'replace').strip()}")
+    
+    audio = np.frombuffer(proc.stdout, dtype='<i2').astype(np.float32)
+    audio /= 32768.0
+    return audio
+
+
+def decode_audio(source: Union[str, bytes]) -> np.ndarray:
+    """
+    Однократное декодирование аудио в float32 массив 16kHz моно.
+    
+    Результат можно передавать в транскрипцию несколько раз (например, при подборе
+    beam_size), не декодируя файл заново. Сначала используется PyAV из faster-whisper
+    (байты читаются из памяти), затем ffmpeg.
+    
+    Args:
+        source: Путь к файлу или байты файла
+    
+    Raises:
+        RuntimeError: Ни один декодер не справился или не установлен
+    """
+    if _pyav_decode is not None:
+        try:
+            return _pyav_decode(io.BytesIO(source) if isinstance(source, bytes) else source, sampling_rate=16000)
+        except Exception as e:
+            if not _FFMPEG:
+                raise RuntimeError(f"PyAV: {e}") from e
+            logger.info(f"PyAV не смог декодировать аудио, используется ffmpeg: {e}")
+    
+    if _FFMPEG:
+        return _ffmpeg_decode(source)
+    raise RuntimeError("Нет декодера аудио: установите faster-whisper или ffmpeg")
+
+
+# Параметры Silero VAD: паузы от 0.5 сек вырезаются, речь дополняется 0.2 сек
+# по краям, чтобы не обрезать начала и концы слов
+VAD_PARAMETERS = {"min_silence_duration_ms": 500, "speech_pad_ms": 200}
+
+# Файлы крупнее этого размера выгружаются из page cache после декодирования
+_FADVISE_MIN_SIZE = 100 * 1024 * 1024
+
+
+def _drop_page_cache(file_path: str) -> None:
+    """
+    Выгружает большой уже декодированный файл из page cache.
+    
+    Сотни мегабайт аудио повторно не читаются и только вытесняли бы
+    из памяти pinned-host буферы CUDA и кэш модели.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        if os.path.getsize(file_path) < _FADVISE_MIN_SIZE:
+            return
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# Форматы, длительность которых soundfile читает из заголовка
+_SOUNDFILE_EXTENSIONS = ('.wav', '.flac', '.ogg')
+
+
 class FileTranscriber:
     """Класс для транскрипции аудио файлов через Whisper."""
     
-    def __init__(self, model_name: str = "large", device: str = "cuda", language: Optional[str] = None):
+    def __init__(
+        self,
+        model_name: str = "large",
+        device: str = "cuda",
+        language: Optional[str] = None,
+        compute_type: Optional[str] = None,
+        device_index: int = 0,
+        flash_attention: bool = False
+    ):
         """
         Инициализация транскрайбера для файлов.
         
@@ -24,11 +160,18 @@ class FileTranscriber:
             model_name: Название модели Whisper (tiny, base, small, medium, large)
             device: Устройство для вычислений (cuda или cpu)
             language: Язык аудио (None для автоопределения)
+            compute_type: Тип вычислений CTranslate2 (None - выбрать по устройству)
+            device_index: Номер GPU для модели
+            flash_attention: Flash attention в CTranslate2 (>= 4.4, GPU Ampere и новее)
         """
         self.model_name = model_name
         self.device = device
         self.language = language
+        self.compute_type = compute_type
+        self.device_index = device_index
+        self.flash_attention = flash_attention
         self.model = None
+        self.batched = None
         
         logger.info(f"Инициализация FileTranscriber с моделью {model_name} на {device}")
         self._load_model()
@@ -40,20 +183,40 @@ class FileTranscriber:
             
             logger.info(f"Загрузка модели {self.model_name}...")
             
-            # Определяем compute_type в зависимости от устройства
-            if self.device == "cuda":
-                compute_type = "float16"
-            else:
-                compute_type = "int8"
+            # Явно заданный тип вычислений или самый быстрый из поддерживаемых устройством
+            compute_type = self.compute_type or _resolve_compute_type(self.device)
             
-            self.model = WhisperModel(
-                self.model_name,
+            model_args = dict(
                 device=self.device,
+                device_index=self.device_index,
                 compute_type=compute_type,
+                # На CPU используем все ядра (по умолчанию CTranslate2 берет 4 потока)
+                cpu_threads=(os.cpu_count() or 0) if self.device == "cpu" else 0,
+                # Транскрипции выполняются по одной (см. HTTPTranscribeServer), лишние
+                # воркеры CTranslate2 только заняли бы память
+                num_workers=1,
                 download_root=None  # Использовать стандартный кеш
             )
             
-            logger.info(f"Модель {self.model_name} успешно загружена на {self.device}")
+            if self.flash_attention and self.device == "cuda":
+                try:
+                    self.model = WhisperModel(self.model_name, flash_attention=True, **model_args)
+                except (TypeError, ValueError) as e:
+                    # Старые faster-whisper/CTranslate2 не знают этот параметр
+                    logger.warning(f"Flash attention недоступен, загрузка без него: {e}")
+            
+            if self.model is None:
+                self.model = WhisperModel(self.model_name, **model_args)
+            
+            logger.info(f"Модель {self.model_name} успешно загружена на {self.device} (compute_type={compute_type})")
+            
+            # Батчевый режим: 30-секундные окна длинных файлов кодируются параллельно
+            # одним батчем (faster-whisper >= 1.1, веса модели общие)
+            try:
+                from faster_whisper import BatchedInferencePipeline
+                self.batched = BatchedInferencePipeline(model=self.model)
+            except ImportError:
+                logger.info("BatchedInferencePipeline недоступен, batch_size > 1 будет проигнорирован")
             
             # Логирование использования GPU памяти
             if self.device == "cuda":
@@ -66,6 +229,39 @@ class FileTranscriber:
             logger.error(f"Ошибка загрузки модели: {e}")
             raise
     
+    def warmup(self, beam_sizes=(1, 5)):
+        """
+        Прогон секунды тишины через модель для каждого beam_size и через VAD.
+        
+        Первый реальный запрос иначе платит за инициализацию CUDA, выбор алгоритмов
+        cuBLAS и выделение буферов CTranslate2 (несколько секунд задержки), а также
+        за загрузку Silero VAD и батчевого pipeline, через которые идут файлы по умолчанию.
+        """
+        if not self.model:
+            return
+        
+        silence = np.zeros(16000, dtype=np.float32)
+        start = time.monotonic()
+        try:
+            for beam_size in beam_sizes:
+                # Сегменты - ленивый генератор: декодирование выполняется только при чтении
+                segments, _ = self.model.transcribe(silence, language=self.language, beam_size=beam_size)
+                for _ in segments:
+                    pass
+            
+            # VAD вырезает всю тишину, и модель на этом проходе не запускается,
+            # поэтому энкодер прогревается выше без VAD
+            pipeline = self.batched if self.batched is not None else self.model
+            segments, _ = pipeline.transcribe(
+                silence, language=self.language, vad_filter=True, vad_parameters=VAD_PARAMETERS
+            )
+            for _ in segments:
+                pass
+        except Exception as e:
+            logger.warning(f"Прогрев модели не удался: {e}")
+            return
+        logger.info(f"Модель прогрета за {time.monotonic() - start:.2f} сек (beam_size={list(beam_sizes)}, VAD)")
+    
     def _log_gpu_memory(self):
         """Логирование использования GPU памяти."""
         try:
@@ -82,61 +278,31 @@ class FileTranscriber:
         except Exception as e:
             logger.warning(f"Не удалось получить информацию о GPU: {e}")
     
-    def convert_audio_to_wav(self, input_path: str, output_path: Optional[str] = None) -> str:
-        """
-        Конвертация аудио файла в WAV формат с параметрами для Whisper.
-        
-        Args:
-            input_path: Путь к входному аудио файлу (MP3, WAV, и др.)
-            output_path: Путь для выходного WAV файла (опционально)
-            
-        Returns:
-            Путь к конвертированному WAV файлу
-        """
-        try:
-            import librosa
-            import soundfile as sf
-            
-            logger.info(f"Конвертация аудио: {input_path}")
-            
-            # Загружаем аудио с требуемым sample rate для Whisper (16kHz)
-            audio, sr = librosa.load(input_path, sr=16000, mono=True)
-            
-            # Создаем временный файл если output_path не указан
-            if output_path is None:
-                temp_fd, output_path = tempfile.mkstemp(suffix='.wav')
-                os.close(temp_fd)
-            
-            # Сохраняем в WAV формат
-            sf.write(output_path, audio, 16000, subtype='PCM_16')
-            
-            duration = len(audio) / 16000
-            logger.info(f"Аудио конвертировано: {duration:.2f} сек, sample_rate=16000Hz")
-            
-            return output_path
-            
-        except ImportError:
-            logger.error("librosa или soundfile не установлены. Установите: pip install librosa soundfile")
-            raise
-        except Exception as e:
-            logger.error(f"Ошибка конвертации аудио: {e}")
-            raise
-    
     def transcribe_file(
         self, 
         file_path: str,
-        beam_size: int = 5,
-        vad_filter: bool = False,
-        temperature: float = 0.0
+        beam_size: int = 1,
+        vad_filter: bool = True,
+        temperature: float = 0.0,
+        batch_size: int = 1,
+        on_segment: Optional[Callable[[Dict[str, Any]], None]] = None,
+        language: Optional[str] = None,
+        best_of: int = 5,
+        patience: float = 1.0
     ) -> Dict[str, Any]:
         """
         Транскрипция аудио файла.
         
         Args:
             file_path: Путь к аудио файлу
-            beam_size: Размер beam search (выше = лучше качество, медленнее)
-            vad_filter: Использовать VAD фильтр для удаления тишины
+            beam_size: Размер beam search (1 = greedy, в 2-3 раза быстрее; 5 = немного точнее на шумном аудио)
+            vad_filter: Вырезать тишину VAD фильтром перед распознаванием
             temperature: Температура для сэмплирования (0.0 = детерминированный)
+            batch_size: Размер батча для длинных файлов (1 = последовательная транскрипция)
+            on_segment: Вызывается для каждого сегмента сразу после его распознавания
+            language: Язык аудио для этого запроса (None - язык транскрайбера)
+            best_of: Число кандидатов при сэмплировании с temperature > 0
+            patience: Терпение beam search (> 1.0 - дольше ищет лучшую гипотезу)
             
         Returns:
             Словарь с результатами транскрипции:
@@ -153,62 +319,184 @@ class FileTranscriber:
         try:
             logger.info(f"Начало транскрипции файла: {file_path}")
             
-            # Конвертируем в WAV если это не WAV
-            file_ext = Path(file_path).suffix.lower()
-            if file_ext != '.wav':
-                logger.info(f"Файл формата {file_ext}, требуется конвертация в WAV")
-                wav_path = self.convert_audio_to_wav(file_path)
-                cleanup_wav = True
-            else:
-                wav_path = file_path
-                cleanup_wav = False
-            
+            # Любой формат декодируется один раз прямо в массив, без временного WAV
             try:
-                # Выполняем транскрипцию
-                segments, info = self.model.transcribe(
-                    wav_path,
-                    language=self.language,
-                    beam_size=beam_size,
-                    vad_filter=vad_filter,
-                    temperature=temperature
-                )
-                
-                # Собираем результаты
-                full_text = []
-                segments_list = []
-                
-                for segment in segments:
-                    full_text.append(segment.text)
-                    segments_list.append({
-                        "start": segment.start,
-                        "end": segment.end,
-                        "text": segment.text.strip()
-                    })
-                
-                result = {
-                    "text": " ".join(full_text).strip(),
-                    "segments": segments_list,
-                    "language": info.language if hasattr(info, 'language') else self.language,
-                    "duration": info.duration if hasattr(info, 'duration') else 0.0
-                }
-                
-                logger.info(f"Транскрипция завершена: {len(segments_list)} сегментов, "
-                           f"{result['duration']:.2f} сек, язык: {result['language']}")
-                
-                return result
-                
-            finally:
-                # Удаляем временный WAV файл если он был создан
-                if cleanup_wav and os.path.exists(wav_path):
-                    try:
-                        os.unlink(wav_path)
-                    except Exception as e:
-                        logger.warning(f"Не удалось удалить временный файл {wav_path}: {e}")
+                audio = decode_audio(file_path)
+            except RuntimeError as e:
+                # Запасной путь для форматов, которые не понимают ни PyAV, ни ffmpeg
+                logger.info(f"Декодирование не удалось, используется librosa: {e}")
+                import librosa
+                audio, _ = librosa.load(file_path, sr=16000, mono=True)
+            
+            # Файл больше не читается: аудио уже в памяти
+            _drop_page_cache(file_path)
+            logger.info(f"Аудио декодировано: {len(audio) / 16000:.2f} сек")
+            return self._transcribe(
+                audio, beam_size, vad_filter, temperature, batch_size, on_segment, language, best_of, patience
+            )
         
         except Exception as e:
             logger.error(f"Ошибка транскрипции файла: {e}")
             raise
     
+    def _transcribe(
+        self,
+        audio: Union[str, np.ndarray],
+        beam_size: int = 1,
+        vad_filter: bool = True,
+        temperature: float = 0.0,
+        batch_size: int = 1,
+        on_segment: Optional[Callable[[Dict[str, Any]], None]] = None,
+        language: Optional[str] = None,
+        best_of: int = 5,
+        patience: float = 1.0
+    ) -> Dict[str, Any]:
+        """
+        Транскрипция подготовленного аудио (путь к WAV или float32 массив 16kHz моно).
+        
+        Сегменты декодируются лениво, поэтому on_segment получает каждый из них
+        до того, как распознан следующий. Если язык известен, определение языка
+        (отдельный проход энкодера по первым 30 сек) пропускается.
+        
+        С vad_filter тишина вырезается до распознавания: на записях встреч это
+        сокращает декодируемое аудио на 30-60%.
+        
+        Returns:
+            Результат транскрипции (см. transcribe_file)
+        """
+        language = language or self.language
+        # Батчевый pipeline режет аудио на куски по разметке VAD: без VAD (и без
+        # clip_timestamps) он падает на аудио длиннее 30 сек, поэтому тогда
+        # используется последовательная транскрипция
+        use_batched = batch_size > 1 and self.batched is not None and vad_filter
+        if use_batched:
+            segments, info = self.batched.transcribe(
+                audio,
+                language=language,
+                task="transcribe",
+                beam_size=beam_size,
+                best_of=best_of,
+                patience=patience,
+                vad_filter=vad_filter,
+                vad_parameters=VAD_PARAMETERS,
+                temperature=temperature,
+                batch_size=batch_size
+            )
+        else:
+            if batch_size > 1 and self.batched is not None:
+                logger.info("batch_size игнорируется: батчевая транскрипция требует vad_filter")
+            segments, info = self.model.transcribe(
+                audio,
+                language=language,
+                task="transcribe",
+                beam_size=beam_size,
+                best_of=best_of,
+                patience=patience,
+                vad_filter=vad_filter,
+                vad_parameters=VAD_PARAMETERS if vad_filter else None,
+                temperature=temperature
+            )
+        
+        # Собираем результаты
+        full_text = []
+        segments_list = []
+        
+        for segment in segments:
+            # Текст сегмента очищается один раз и используется в обоих местах
+            text = segment.text.strip()
+            full_text.append(text)
+            segment_data = {
+                "start": segment.start,
+                "end": segment.end,
+                "text": text
+            }
+            segments_list.append(segment_data)
+            if on_segment is not None:
+                on_segment(segment_data)
+        
+        result = {
+            "text": " ".join(full_text),
+            "segments": segments_list,
+            "language": info.language if hasattr(info, 'language') else language,
+            "duration": info.duration if hasattr(info, 'duration') else 0.0
+        }
+        
+        logger.info(f"Транскрипция завершена: {len(segments_list)} сегментов, "
+                   f"{result['duration']:.2f} сек, язык: {result['language']}")
+        
+        duration_after_vad = getattr(info, 'duration_after_vad', None)
+        if vad_filter and duration_after_vad is not None:
+            logger.info(f"VAD пропустил {result['duration'] - duration_after_vad:.2f} сек тишины "
+                       f"(распознано {duration_after_vad:.2f} сек)")
+        
+        return result
+    
+    def transcribe_pcm(
+        self,
+        pcm_bytes: bytes,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        beam_size: int = 1,
+        vad_filter: bool = True,
+        temperature: float = 0.0,
+        batch_size: int = 1,
+        on_segment: Optional[Callable[[Dict[str, Any]], None]] = None,
+        language: Optional[str] = None,
+        best_of: int = 5,
+        patience: float = 1.0
+    ) -> Dict[str, Any]:
+        """
+        Транскрипция сырого PCM (16-bit little-endian) без WAV контейнера.
+        
+        Аудио передается в модель напрямую массивом: без временного файла,
+        без разбора заголовка и без конвертации через librosa.
+        
+        Args:
+            pcm_bytes: Байты PCM16 LE
+            sample_rate: Частота дискретизации входных данных
+            channels: Количество каналов (чередующиеся сэмплы)
+            beam_size: Размер beam search
+            vad_filter: Вырезать тишину VAD фильтром перед распознаванием
+            temperature: Температура для сэмплирования
+            batch_size: Размер батча для длинных записей (1 = последовательная транскрипция)
+            on_segment: Вызывается для каждого сегмента сразу после его распознавания
+            language: Язык аудио для этого запроса (None - язык транскрайбера)
+            best_of: Число кандидатов при сэмплировании с temperature > 0
+            patience: Терпение beam search (> 1.0 - дольше ищет лучшую гипотезу)
+            
+        Returns:
+            Результат транскрипции (см. transcribe_file)
+        """
+        if not self.model:
+            raise RuntimeError("Модель не загружена")
+        
+        try:
+            frame_size = 2 * channels
+            usable = len(pcm_bytes) - len(pcm_bytes) % frame_size
+            audio = np.frombuffer(pcm_bytes, dtype=np.int16, count=usable // 2).astype(np.float32)
+            audio /= 32768.0
+            
+            if channels > 1:
+                audio = audio.reshape(-1, channels).mean(axis=1)
+            
+            if sample_rate != 16000:
+                if resample_poly is None:
+                    raise RuntimeError("Для ресамплинга PCM требуется scipy: pip install scipy")
+                
+                divisor = gcd(16000, sample_rate)
+                audio = resample_poly(audio, 16000 // divisor, sample_rate // divisor).astype(np.float32)
+            
+            logger.info(f"Начало транскрипции PCM: {len(audio) / 16000:.2f} сек, "
+                       f"исходный sample_rate={sample_rate}Hz, каналов={channels}")
+            
+            return self._transcribe(
+                audio, beam_size, vad_filter, temperature, batch_size, on_segment, language, best_of, patience
+            )
+        
+        except Exception as e:
+            logger.error(f"Ошибка транскрипции PCM: {e}")
+            raise
+    
     def transcribe_bytes(
         self,
         audio_bytes: bytes,
@@ -226,6 +514,19 @@ class FileTranscriber:
         Returns:
             Результат транскрипции (см. transcribe_file)
         """
+        # Байты декодируются прямо из памяти, без временного файла. Если это
+        # не удалось (например, ffmpeg не может разобрать MP4 с moov в конце
+        # из pipe), используется временный файл ниже
+        try:
+            audio = decode_audio(audio_bytes)
+        except RuntimeError as e:
+            logger.info(f"Декодирование из памяти не удалось, используется временный файл: {e}")
+        else:
+            if not self.model:
+                raise RuntimeError("Модель не загружена")
+            logger.info(f"Аудио декодировано: {len(audio) / 16000:.2f} сек")
+            return self._transcribe(audio, **kwargs)
+        
         # Создаем временный файл
         temp_fd, temp_path = tempfile.mkstemp(suffix=file_extension)
         
@@ -251,12 +552,31 @@ class FileTranscriber:
         """
         Получение длительности аудио файла.
         
+        Длительность берется из заголовка контейнера (soundfile для WAV/FLAC/OGG,
+        PyAV для остальных форматов), без декодирования всего файла. librosa
+        используется только если заголовок прочитать не удалось.
+        
         Args:
             file_path: Путь к аудио файлу
             
         Returns:
             Длительность в секундах
         """
+        if file_path.lower().endswith(_SOUNDFILE_EXTENSIONS):
+            try:
+                import soundfile
+                return soundfile.info(file_path).duration
+            except Exception as e:
+                logger.debug(f"soundfile не прочитал заголовок {file_path}: {e}")
+        
+        try:
+            import av
+            with av.open(file_path) as container:
+                if container.duration is not None:
+                    return container.duration / av.time_base
+        except Exception as e:
+            logger.debug(f"PyAV не прочитал заголовок {file_path}: {e}")
+        
         try:
             import librosa
             duration = librosa.get_duration(path=file_path)
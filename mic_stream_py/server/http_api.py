@@ -4,15 +4,167 @@ HTTP API сервер для загрузки и транскрипции ауд
 Работает параллельно с WebSocket сервером для real-time транскрипции.
 """
 
+import os
+import json
 import logging
 import asyncio
-from typing import Optional
+import tempfile
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
 from aiohttp import web
 from env_config import env_config
 from file_transcriber import FileTranscriber
 
+try:
+    # Опциональный быстрый JSON сериализатор (pip install orjson): в разы быстрее
+    # json.dumps на длинных списках сегментов и сразу возвращает UTF-8 bytes
+    import orjson
+    _json_dumps = orjson.dumps
+except ImportError:
+    def _json_dumps(data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
 logger = logging.getLogger('HTTPServer')
 
+# Content-Type запросов с сырым PCM16 LE (без WAV контейнера и multipart)
+RAW_PCM_CONTENT_TYPES = frozenset(('application/octet-stream', 'audio/l16'))
+
+# Размер блока при потоковой записи загружаемого файла на диск
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Количество блоков, записываемых на диск одним вызовом writev
+UPLOAD_WRITE_BATCH = 16
+
+# Максимальная длительность загружаемого аудио (см. FileTranscriber.validate_audio_file)
+MAX_DURATION_SEC = 7200
+
+# Нижняя граница битрейта сжатой речи: файл меньше MAX_DURATION_SEC * 6 кбит/с
+# (~5.4MB) заведомо не длиннее лимита, и его длительность можно не проверять.
+# 6 кбит/с - минимум для речи в Opus/OGG (обычно 12-24 кбит/с); проверка длительности
+# читает заголовок контейнера и дешева, поэтому запас берется с избытком
+MIN_SPEECH_BYTES_PER_SEC = 6000 // 8
+
+
+# Значения параметра stream, включающие NDJSON ответ
+_TRUE_VALUES = frozenset(('true', '1', 'yes'))
+
+
+def _ndjson_line(data: Dict[str, Any]) -> bytes:
+    """Одна строка NDJSON"""
+    return _json_dumps(data) + b'\n'
+
+
+def _json_response(
+    data: Any,
+    status: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> web.Response:
+    """JSON ответ, сериализованный сразу в bytes (без промежуточной строки)"""
+    return web.Response(body=_json_dumps(data), status=status, headers=headers,
+                        content_type='application/json', charset='utf-8')
+
+
+class _UploadTooLarge(Exception):
+    """Загружаемый файл превышает MAX_FILE_SIZE_MB."""
+
+
+def _parse_content_type_params(content_type: str) -> dict:
+    """Параметры Content-Type, например rate/channels из audio/l16;rate=16000;channels=1"""
+    params = {}
+    for part in content_type.split(';')[1:]:
+        key, sep, value = part.partition('=')
+        if sep:
+            params[key.strip().lower()] = value.strip().strip('"')
+    return params
+
+
+class _TempUpload:
+    """
+    Временный файл загрузки.
+    
+    На Linux создается через O_TMPFILE: файл не появляется в каталоге и удаляется
+    ядром при закрытии дескриптора (в том числе при падении процесса), а декодеры
+    открывают его по пути /proc/<pid>/fd/N. Путь содержит PID сервера, а не self:
+    дочерние процессы (ffmpeg, audioread) разрешают /proc/self в свою таблицу
+    дескрипторов. На других системах - mkstemp + unlink.
+    """
+    
+    def __init__(self, suffix: str):
+        self.fd = None
+        self.path = None
+        self.size = 0
+        self._unlink = False
+        
+        if hasattr(os, 'O_TMPFILE'):
+            try:
+                self.fd = os.open(tempfile.gettempdir(), os.O_TMPFILE | os.O_RDWR, 0o600)
+                self.path = f"/proc/{os.getpid()}/fd/{self.fd}"
+            except OSError:
+                # Файловая система не поддерживает O_TMPFILE
+                self.fd = None
+        
+        if self.fd is None:
+            self.fd, self.path = tempfile.mkstemp(suffix=suffix)
+            self._unlink = True
+    
+    def write_chunks(self, chunks: List[bytes]):
+        """Запись накопленных блоков одним системным вызовом, без склейки в Python."""
+        written = os.writev(self.fd, chunks)
+        total = sum(len(chunk) for chunk in chunks)
+        # Короткая запись возможна только в редких случаях - дописываем остаток
+        if written < total:
+            os.write(self.fd, b''.join(chunks)[written:])
+        self.size += total
+    
+    def close(self):
+        """Закрытие и удаление файла."""
+        os.close(self.fd)
+        if self._unlink:
+            try:
+                os.unlink(self.path)
+            except OSError as e:
+                logger.warning(f"Не удалось удалить временный файл {self.path}: {e}")
+
+
+async def _save_field_to_temp(field, suffix: str, max_size: int) -> _TempUpload:
+    """
+    Потоковая запись поля multipart во временный файл.
+    
+    В памяти держится только несколько текущих блоков, а не вся загрузка. client_max_size
+    aiohttp не применяется к потоковому чтению multipart, поэтому лимит размера
+    проверяется здесь.
+    
+    Returns:
+        Временный файл с записанными данными (закрывает вызывающий код)
+        
+    Raises:
+        _UploadTooLarge: Файл больше max_size байт
+    """
+    upload = _TempUpload(suffix)
+    pending = []
+    pending_size = 0
+    try:
+        while True:
+            chunk = await field.read_chunk(UPLOAD_CHUNK_SIZE)
+            if chunk:
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if upload.size + pending_size > max_size:
+                    raise _UploadTooLarge()
+            # Блоки пишутся пачками по UPLOAD_WRITE_BATCH через writev
+            if pending and (not chunk or len(pending) >= UPLOAD_WRITE_BATCH):
+                upload.write_chunks(pending)
+                pending = []
+                pending_size = 0
+            if not chunk:
+                break
+    except BaseException:
+        upload.close()
+        raise
+    return upload
+
+
 class HTTPTranscribeServer:
     """HTTP сервер для обработки загрузки файлов и транскрипции."""
     
@@ -26,11 +178,23 @@ class HTTPTranscribeServer:
         """
         self.host = host
         self.port = port
-        self.app = web.Application(
-            client_max_size=env_config.get('max_file_size_mb', 500) * 1024 * 1024
-        )
+        self.max_file_size = env_config.get('max_file_size_mb', 500) * 1024 * 1024
+        self.app = web.Application(client_max_size=self.max_file_size)
         self.transcriber: Optional[FileTranscriber] = None
         
+        # Event loop сервера, запоминается в start() и используется всеми обработчиками
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Модель на GPU не рассчитана на параллельные вызовы из разных потоков:
+        # загрузка и все транскрипции выполняются по очереди в одном выделенном потоке
+        self._gpu_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper-gpu")
+        self.app.on_cleanup.append(self._shutdown_pool)
+        
+        # Ограничение очереди: запросы сверх лимита сразу получают 503 с Retry-After,
+        # а не ждут минуты в очереди executor'а, занимая диск и память
+        self.max_pending = env_config.get('file_queue_size', 8)
+        self.pending = 0
+        
         # Настройка routes
         self.app.router.add_post('/transcribe', self.handle_transcribe)
         self.app.router.add_get('/health', self.handle_health)
@@ -38,22 +202,94 @@ class HTTPTranscribeServer:
         
         logger.info(f"HTTP сервер инициализирован на {host}:{port}")
     
+    async def _shutdown_pool(self, app: web.Application):
+        """Остановка потока транскрипции при завершении приложения."""
+        self._gpu_pool.shutdown(wait=True)
+    
+    async def _stream_transcription(
+        self,
+        request: web.Request,
+        transcribe: Callable[..., Dict[str, Any]]
+    ) -> web.StreamResponse:
+        """
+        Потоковый ответ в формате NDJSON: строка на каждый сегмент по мере распознавания.
+        
+        Последняя строка - итог {"type": "done", "text", "language", "duration"}
+        или {"type": "error", "error"}, так как статус уже отправлен.
+        
+        Args:
+            transcribe: Метод транскрайбера с привязанными аргументами, принимающий on_segment
+        """
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        
+        # Сегменты из потока транскрипции передаются в event loop через очередь;
+        # None после завершения задачи означает конец (call_soon_threadsafe сохраняет порядок)
+        loop = self._loop
+        queue: asyncio.Queue = asyncio.Queue()
+        future = loop.run_in_executor(
+            self._gpu_pool,
+            lambda: transcribe(on_segment=lambda segment: loop.call_soon_threadsafe(queue.put_nowait, segment))
+        )
+        future.add_done_callback(lambda _: queue.put_nowait(None))
+        
+        try:
+            while True:
+                segment = await queue.get()
+                if segment is None:
+                    break
+                await response.write(_ndjson_line({"type": "segment", **segment}))
+            
+            try:
+                result = future.result()
+                summary = {
+                    "type": "done",
+                    "text": result["text"],
+                    "language": result["language"],
+                    "duration": result["duration"]
+                }
+            except Exception as e:
+                logger.error(f"Ошибка потоковой транскрипции: {e}", exc_info=True)
+                summary = {"type": "error", "error": f"Ошибка транскрипции: {str(e)}"}
+            
+            await response.write(_ndjson_line(summary))
+            await response.write_eof()
+            return response
+        except ConnectionResetError:
+            logger.info("Клиент отключился во время потоковой транскрипции")
+            return response
+        finally:
+            # Клиент мог отключиться: дожидаемся транскрипции, прежде чем вызывающий
+            # код удалит временный файл, который она читает
+            if not future.done():
+                await asyncio.gather(future, return_exceptions=True)
+    
     async def initialize_transcriber(self):
         """Инициализация транскрайбера в event loop."""
         try:
             model_name = env_config.get('file_model', 'large')
             device = env_config.get('device', 'cuda')
             language = env_config.get('language')
+            compute_type = env_config.get('file_compute_type')
+            device_index = env_config.get('file_device_index', 0)
+            flash_attention = env_config.get('file_flash_attention', False)
             
             logger.info(f"Инициализация FileTranscriber: модель={model_name}, устройство={device}")
             
-            # Создаем транскрайбер в отдельном потоке чтобы не блокировать event loop
-            loop = asyncio.get_event_loop()
-            self.transcriber = await loop.run_in_executor(
-                None,
-                lambda: FileTranscriber(model_name=model_name, device=device, language=language)
+            # Создаем транскрайбер в потоке транскрипции чтобы не блокировать event loop
+            transcriber = await self._loop.run_in_executor(
+                self._gpu_pool,
+                lambda: FileTranscriber(
+                    model_name=model_name, device=device, language=language, compute_type=compute_type,
+                    device_index=device_index, flash_attention=flash_attention
+                )
             )
             
+            # Прогрев до публикации: transcriber_ready=true означает, что первый
+            # запрос не заплатит за инициализацию CUDA ядер и буферов
+            await self._loop.run_in_executor(self._gpu_pool, transcriber.warmup)
+            self.transcriber = transcriber
+            
             logger.info("FileTranscriber успешно инициализирован")
             
         except Exception as e:
@@ -69,7 +305,7 @@ class HTTPTranscribeServer:
         Returns:
             JSON: {"status": "ok", "transcriber_ready": bool}
         """
-        return web.json_response({
+        return _json_response({
             "status": "ok",
             "transcriber_ready": self.transcriber is not None
         })
@@ -89,9 +325,20 @@ class HTTPTranscribeServer:
             "language": env_config.get('language', 'auto'),
             "max_file_size_mb": env_config.get('max_file_size_mb', 500),
             "supported_formats": ["mp3", "wav", "m4a", "flac", "ogg", "opus"],
-            "transcriber_ready": self.transcriber is not None
+            "raw_pcm": True,
+            "transcriber_ready": self.transcriber is not None,
+            "queue": {"pending": self.pending, "limit": self.max_pending},
+            # beam_size=1 (greedy) в 2-3 раза быстрее декодирует при почти той же точности
+            # на чистом аудио; 5 - немного точнее на шумных записях
+            "defaults": {
+                "beam_size": env_config.get('file_beam_size', 1),
+                "best_of": 5,
+                "patience": 1.0,
+                "vad_filter": env_config.get('file_vad_filter', True),
+                "batch_size": env_config.get('file_batch_size', 1)
+            }
         }
-        return web.json_response(info)
+        return _json_response(info)
     
     async def handle_transcribe(self, request: web.Request) -> web.Response:
         """
@@ -102,10 +349,16 @@ class HTTPTranscribeServer:
         
         Form fields:
             - file: аудио файл (обязательно)
-            - beam_size: размер beam search (опционально, default=5)
+            - beam_size: размер beam search (опционально, default=FILE_BEAM_SIZE)
+            - best_of: число кандидатов при сэмплировании (опционально, default=5)
+            - patience: терпение beam search (опционально, default=1.0)
             - language: язык аудио (опционально, override конфига)
-            - vad_filter: использовать VAD фильтр (опционально, default=true)
+            - vad_filter: вырезать тишину VAD фильтром (опционально, default=FILE_VAD_FILTER)
             - include_segments: включить сегменты с временными метками (опционально, default=false)
+            - batch_size: размер батча для длинных файлов (опционально, default=FILE_BATCH_SIZE)
+        
+        Query:
+            - stream=1: отдавать сегменты по мере распознавания (NDJSON, см. _stream_transcription)
         
         Returns:
             JSON:
@@ -117,29 +370,56 @@ class HTTPTranscribeServer:
             }
         """
         if not self.transcriber:
-            return web.json_response(
+            return _json_response(
                 {"error": "Транскрайбер не инициализирован"},
                 status=503
             )
         
+        if self.pending >= self.max_pending:
+            return _json_response(
+                {"error": "Очередь транскрипции заполнена, повторите запрос позже"},
+                status=503,
+                headers={'Retry-After': '1'}
+            )
+        
+        self.pending += 1
+        try:
+            if request.content_type in RAW_PCM_CONTENT_TYPES:
+                return await self.handle_transcribe_pcm(request)
+            return await self.handle_transcribe_multipart(request)
+        finally:
+            self.pending -= 1
+    
+    async def handle_transcribe_multipart(self, request: web.Request) -> web.Response:
+        """Транскрипция файла из multipart/form-data (поля описаны в handle_transcribe)."""
+        upload = None
         try:
             # Читаем multipart form data
             reader = await request.multipart()
             
-            audio_data = None
-            audio_filename = None
-            beam_size = 5
+            file_ext = '.mp3'  # По умолчанию
+            beam_size = env_config.get('file_beam_size', 1)
+            best_of = 5
+            patience = 1.0
             language = None
-            vad_filter = False
+            vad_filter = env_config.get('file_vad_filter', True)
             include_segments = False
+            batch_size = env_config.get('file_batch_size', 1)
             
             # Парсим form fields
             async for field in reader:
                 if field.name == 'file':
-                    # Читаем файл
+                    # Определяем расширение файла
                     audio_filename = field.filename
-                    audio_data = await field.read()
-                    logger.info(f"Получен файл: {audio_filename}, размер: {len(audio_data) / (1024*1024):.2f}MB")
+                    if audio_filename:
+                        file_ext = '.' + audio_filename.rsplit('.', 1)[-1].lower()
+                    
+                    # Повторное поле file заменяет предыдущее
+                    if upload:
+                        upload.close()
+                        upload = None
+                    upload = await _save_field_to_temp(field, file_ext, self.max_file_size)
+                    logger.info(f"Получен файл: {audio_filename}, размер: {upload.size / (1024*1024):.2f}MB")
                     
                 elif field.name == 'beam_size':
                     try:
@@ -147,6 +427,24 @@ class HTTPTranscribeServer:
                     except ValueError:
                         pass
                         
+                elif field.name == 'best_of':
+                    try:
+                        best_of = int(await field.text())
+                    except ValueError:
+                        pass
+                        
+                elif field.name == 'patience':
+                    try:
+                        patience = float(await field.text())
+                    except ValueError:
+                        pass
+                        
+                elif field.name == 'batch_size':
+                    try:
+                        batch_size = int(await field.text())
+                    except ValueError:
+                        pass
+                        
                 elif field.name == 'language':
                     language_text = await field.text()
                     if language_text and language_text.lower() not in ['auto', 'none', 'null']:
@@ -161,32 +459,44 @@ class HTTPTranscribeServer:
                     include_segments = seg_text.lower() in ['true', '1', 'yes']
             
             # Проверяем что файл загружен
-            if not audio_data:
-                return web.json_response(
+            if not upload or not upload.size:
+                return _json_response(
                     {"error": "Файл не загружен. Используйте поле 'file' в multipart/form-data"},
                     status=400
                 )
             
-            # Определяем расширение файла
-            if audio_filename:
-                file_ext = '.' + audio_filename.rsplit('.', 1)[-1].lower()
-            else:
-                file_ext = '.mp3'  # По умолчанию
+            # Длительность проверяем только у файлов, которые по размеру могут превысить лимит:
+            # для остальных это лишнее чтение файла на пути запроса
+            if upload.size > MAX_DURATION_SEC * MIN_SPEECH_BYTES_PER_SEC:
+                validation = await self._loop.run_in_executor(
+                    None,
+                    lambda: self.transcriber.validate_audio_file(
+                        upload.path,
+                        max_size_mb=env_config.get('max_file_size_mb', 500),
+                        max_duration_sec=MAX_DURATION_SEC
+                    )
+                )
+                if not validation["valid"]:
+                    return _json_response({"error": validation["error"]}, status=413)
             
             logger.info(f"Начало транскрипции: beam_size={beam_size}, language={language}, "
-                       f"vad_filter={vad_filter}, file_ext={file_ext}")
-            
-            # Выполняем транскрипцию в отдельном потоке
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                lambda: self.transcriber.transcribe_bytes(
-                    audio_data,
-                    file_extension=file_ext,
-                    beam_size=beam_size,
-                    vad_filter=vad_filter
-                )
+                       f"vad_filter={vad_filter}, batch_size={batch_size}, file_ext={file_ext}")
+            
+            transcribe = functools.partial(
+                self.transcriber.transcribe_file,
+                upload.path,
+                beam_size=beam_size,
+                vad_filter=vad_filter,
+                batch_size=batch_size,
+                language=language,
+                best_of=best_of,
+                patience=patience
             )
+            if request.query.get('stream', '').lower() in _TRUE_VALUES:
+                return await self._stream_transcription(request, transcribe)
+            
+            # Выполняем транскрипцию в потоке транскрипции
+            result = await self._loop.run_in_executor(self._gpu_pool, transcribe)
             
             # Формируем ответ
             response_data = {
@@ -202,11 +512,122 @@ class HTTPTranscribeServer:
             logger.info(f"Транскрипция завершена: {len(result['text'])} символов, "
                        f"{result['duration']:.2f} сек")
             
-            return web.json_response(response_data)
+            return _json_response(response_data)
             
+        except _UploadTooLarge:
+            return _json_response(
+                {"error": f"Размер файла превышает лимит {env_config.get('max_file_size_mb', 500)}MB"},
+                status=413
+            )
         except Exception as e:
             logger.error(f"Ошибка обработки запроса: {e}", exc_info=True)
-            return web.json_response(
+            return _json_response(
+                {"error": f"Ошибка транскрипции: {str(e)}"},
+                status=500
+            )
+        finally:
+            # Удаляем временный файл загрузки
+            if upload:
+                upload.close()
+    
+    async def handle_transcribe_pcm(self, request: web.Request) -> web.Response:
+        """
+        Транскрипция сырого PCM16 LE без WAV/multipart обертки.
+        
+        POST /transcribe?beam_size=1&best_of=5&patience=1.0&vad_filter=true&include_segments=false&batch_size=1&stream=0
+        Content-Type: application/octet-stream (или audio/l16;rate=16000)
+        
+        Headers:
+            - X-Sample-Rate: частота дискретизации (default=16000 или rate из audio/l16)
+            - X-Channels: количество каналов (default=1)
+            - X-Dtype: формат сэмплов, поддерживается только int16
+        
+        Returns:
+            JSON в том же формате, что и multipart вариант
+        """
+        dtype = request.headers.get('X-Dtype', 'int16').lower()
+        if dtype != 'int16':
+            return _json_response({"error": f"Неподдерживаемый X-Dtype: {dtype} (ожидается int16)"}, status=415)
+        
+        try:
+            params = request.query
+            content_params = _parse_content_type_params(request.headers.get('Content-Type', ''))
+            try:
+                sample_rate = int(request.headers.get('X-Sample-Rate') or content_params.get('rate') or 16000)
+                channels = int(request.headers.get('X-Channels') or content_params.get('channels') or 1)
+                beam_size = int(params.get('beam_size', env_config.get('file_beam_size', 1)))
+                best_of = int(params.get('best_of', 5))
+                patience = float(params.get('patience', 1.0))
+                batch_size = int(params.get('batch_size', env_config.get('file_batch_size', 1)))
+            except ValueError:
+                return _json_response(
+                    {
+                        "error": "Некорректные параметры sample rate / channels / "
+                                 "beam_size / best_of / patience / batch_size"
+                    },
+                    status=400
+                )
+            if sample_rate <= 0 or channels <= 0:
+                return _json_response({"error": "sample rate и channels должны быть положительными"}, status=400)
+            
+            vad_filter = params.get('vad_filter')
+            vad_filter = (env_config.get('file_vad_filter', True) if vad_filter is None
+                          else vad_filter.lower() in ['true', '1', 'yes'])
+            include_segments = params.get('include_segments', 'false').lower() in ['true', '1', 'yes']
+            language = params.get('language')
+            if language and language.lower() in ['auto', 'none', 'null']:
+                language = None
+            
+            pcm_data = await request.read()
+            if not pcm_data:
+                return _json_response({"error": "Пустое тело запроса"}, status=400)
+            
+            # Длительность сырого PCM известна по размеру - тот же лимит, что и для файлов
+            duration = len(pcm_data) / (2 * channels * sample_rate)
+            if duration > MAX_DURATION_SEC:
+                return _json_response(
+                    {"error": f"Длительность {duration:.1f}сек превышает лимит {MAX_DURATION_SEC}сек"},
+                    status=413
+                )
+            
+            logger.info(f"Получен PCM: {len(pcm_data) / (1024*1024):.2f}MB, sample_rate={sample_rate}, "
+                       f"channels={channels}, beam_size={beam_size}, language={language}, vad_filter={vad_filter}")
+            
+            transcribe = functools.partial(
+                self.transcriber.transcribe_pcm,
+                pcm_data,
+                sample_rate=sample_rate,
+                channels=channels,
+                beam_size=beam_size,
+                vad_filter=vad_filter,
+                batch_size=batch_size,
+                language=language,
+                best_of=best_of,
+                patience=patience
+            )
+            if params.get('stream', '').lower() in _TRUE_VALUES:
+                return await self._stream_transcription(request, transcribe)
+            
+            result = await self._loop.run_in_executor(self._gpu_pool, transcribe)
+            
+            response_data = {
+                "text": result["text"],
+                "language": result["language"],
+                "duration": result["duration"]
+            }
+            if include_segments:
+                response_data["segments"] = result["segments"]
+            
+            return _json_response(response_data)
+            
+        except web.HTTPRequestEntityTooLarge:
+            return _json_response(
+                {"error": f"Размер файла превышает лимит {env_config.get('max_file_size_mb', 500)}MB"},
+                status=413
+            )
+        except Exception as e:
+            logger.error(f"Ошибка обработки PCM запроса: {e}", exc_info=True)
+            return _json_response(
                 {"error": f"Ошибка транскрипции: {str(e)}"},
                 status=500
             )
@@ -214,6 +635,8 @@ class HTTPTranscribeServer:
     async def start(self):
         """Запуск HTTP сервера."""
         try:
+            self._loop = asyncio.get_running_loop()
+            
             # Инициализируем транскрайбер
             await self.initialize_transcriber()
             
@@ -258,5 +681,10 @@ if __name__ == '__main__':
         format='%(message)s'
     )
     
-    # Запуск сервера
-    asyncio.run(run_http_server())
+    # Запуск сервера (на uvloop, если установлен)
+    try:
+        import uvloop
+        run = uvloop.run
+    except (ImportError, AttributeError):
+        run = asyncio.run
+    run(run_http_server())
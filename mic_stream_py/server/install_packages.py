@@ -5,6 +5,8 @@
 """
 
 import importlib
+import importlib.util
+import os
 import subprocess
 import sys
 
@@ -12,34 +14,47 @@ def check_and_install_packages(packages):
     """
     Проверяет наличие пакетов и устанавливает отсутствующие.
     
+    Все отсутствующие пакеты ставятся одним вызовом pip: один запуск pip
+    и одно разрешение зависимостей вместо отдельного процесса на пакет.
+    
     Args:
         packages (list): Список словарей с информацией о пакетах
     """
+    missing = []
     for package_info in packages:
         module_name = package_info['module_name']
         install_name = package_info.get('install_name', module_name)
         attribute = package_info.get('attribute')
         
         try:
-            # Пытаемся импортировать модуль
-            module = importlib.import_module(module_name)
+            # Наличие модуля проверяем без его выполнения: импорт torch или
+            # faster-whisper ради проверки занял бы секунды и гигабайты памяти
+            if importlib.util.find_spec(module_name) is None:
+                raise ImportError(f"Модуль {module_name} не найден")
             
-            # Если указан атрибут, проверяем его наличие
-            if attribute and not hasattr(module, attribute):
+            # Если указан атрибут, модуль приходится импортировать
+            if attribute and not hasattr(importlib.import_module(module_name), attribute):
                 raise ImportError(f"Атрибут {attribute} не найден в модуле {module_name}")
                 
             print(f"✓ {module_name} уже установлен")
             
         except ImportError:
-            print(f"⚠ {module_name} не найден, устанавливаю {install_name}...")
-            try:
-                subprocess.check_call([
-                    sys.executable, '-m', 'pip', 'install', install_name
-                ])
-                print(f"✓ {install_name} успешно установлен")
-            except subprocess.CalledProcessError as e:
-                print(f"✗ Ошибка установки {install_name}: {e}")
-                sys.exit(1)
+            print(f"⚠ {module_name} не найден")
+            missing.append(install_name)
+    
+    if not missing:
+        return
+    
+    print(f"Устанавливаю: {' '.join(missing)}...")
+    try:
+        subprocess.check_call(
+            [sys.executable, '-m', 'pip', 'install', '--no-input', '--disable-pip-version-check', *missing],
+            env={**os.environ, 'PIP_NO_PYTHON_VERSION_WARNING': '1'}
+        )
+        print(f"✓ Успешно установлены: {' '.join(missing)}")
+    except subprocess.CalledProcessError as e:
+        print(f"✗ Ошибка установки {' '.join(missing)}: {e}")
+        sys.exit(1)
 
 if __name__ == '__main__':
     # Тестируем функцию
@@ -7,10 +7,15 @@
 
 import sys
 import json
+import queue
+import time
+import struct
 import asyncio
 import logging
 import threading
-from datetime import datetime
+from types import SimpleNamespace
+from collections import deque
+from math import gcd
 from env_config import env_config
 
 # Настройка логирования для Docker
@@ -26,12 +31,65 @@ try:
     import websockets
     from colorama import init
     from RealtimeSTT import AudioToTextRecorder
-    from scipy.signal import resample
+    from scipy.signal import firwin, resample_poly
     import pyaudio
 except ImportError as e:
     print(f"Ошибка импорта: {e}")
     sys.exit(1)
 
+try:
+    # Опциональный быстрый JSON сериализатор (pip install orjson)
+    import orjson
+    
+    def _json_str(value):
+        return orjson.dumps(value).decode('utf-8')
+    
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_str(value):
+        return json.dumps(value, ensure_ascii=False)
+    
+    def _json_loads(data):
+        return json.loads(bytes(data))
+
+try:
+    # Опциональный JIT для быстрого пути целочисленной децимации (pip install numba)
+    import numba
+except ImportError:
+    numba = None
+
+if numba is not None:
+    @numba.njit(cache=True, fastmath=True, boundscheck=False)
+    def _decimate(src, window, down, dst):
+        """
+        Децимация int16 в down раз тем же FIR фильтром, что и resample_poly(x, 1, down).
+        
+        Отсчеты за границами чанка считаются нулями, выход выровнен по задержке
+        фильтра, поэтому результат совпадает с resample_poly с точностью до округления.
+        
+        Returns:
+            Количество записанных в dst отсчетов (ceil(len(src) / down))
+        """
+        n = src.shape[0]
+        taps = window.shape[0]
+        half_len = (taps - 1) // 2
+        n_out = (n + down - 1) // down
+        for i in range(n_out):
+            center = i * down + half_len
+            acc = np.float32(0.0)
+            for k in range(taps):
+                j = center - k
+                if 0 <= j < n:
+                    acc += window[k] * src[j]
+            if acc > 32767.0:
+                acc = 32767.0
+            elif acc < -32768.0:
+                acc = -32768.0
+            dst[i] = np.int16(acc)
+        return n_out
+else:
+    _decimate = None
+
 # Инициализация colorama
 init()
 
@@ -39,6 +97,37 @@ init()
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 
+# Длина JSON метаданных в начале бинарного пакета data канала (uint32 LE)
+_METADATA_LENGTH = struct.Struct('<I')
+
+# Лимиты data канала: 50 мс чанки 48kHz PCM16 (~5KB) с большим запасом
+DATA_MAX_MESSAGE_SIZE = 2 ** 22
+DATA_WRITE_LIMIT = 2 ** 18
+
+# Окно объединения промежуточных (realtime) обновлений текста в одно сообщение
+REALTIME_COALESCE_SEC = 0.02
+
+# Энергетический гейт (ENERGY_GATE): начальный уровень шума (RMS int16) и пороги
+ENERGY_GATE_INITIAL_FLOOR = 50.0
+ENERGY_GATE_ADAPT_RATIO = 2.0
+ENERGY_GATE_SILENCE_RATIO = 1.5
+
+# Начальный размер буфера ресамплинга (1 сек при 16kHz)
+RESAMPLE_BUFFER_SAMPLES = 16000
+
+# Максимум аудио чанков, ожидающих ресамплинга и передачи в recorder
+# (~5 сек при чанках по 50 мс); при переполнении отбрасываются самые старые
+AUDIO_QUEUE_CHUNKS = 100
+
+# Начала сообщений data канала: на каждое сообщение сериализуется только текст.
+# Сообщения остаются str, так как клиенты ожидают текстовые WebSocket фреймы
+_REALTIME_PREFIX = '{"type": "realtime", "text": '
+_FULL_SENTENCE_PREFIX = '{"type": "fullSentence", "text": '
+
+# Неизменяемые ответы control канала сериализуются один раз при импорте
+_RECORDER_NOT_READY_RESPONSE = json.dumps({"status": "error", "message": "Recorder не готов"})
+_INVALID_JSON_RESPONSE = json.dumps({"status": "error", "message": "Неверный JSON"})
+
 # Цвета для вывода
 class Colors:
     HEADER = '\033[95m'
@@ -50,18 +139,62 @@ class Colors:
     ENDC = '\033[0m'
     BOLD = '\033[1m'
 
+def _chunk_rms(chunk):
+    """RMS PCM16 чанка."""
+    samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)
+    if not len(samples):
+        return 0.0
+    return float(np.sqrt(np.dot(samples, samples) / len(samples)))
+
+
 class STTServer:
+    __slots__ = (
+        'args', 'cfg', 'recorder', 'recorder_ready', 'stop_recorder', 'prev_text',
+        'control_connections', 'data_connections', 'pending_messages', 'pending_event',
+        'latest_realtime', '_ts_second', '_ts_prefix',
+        'audio_chunks', '_resample_windows',
+        'allowed_methods', 'allowed_parameters',
+    )
+    
     def __init__(self, args):
         self.args = args
+        # Снимок конфигурации: дальше параметры читаются как атрибуты, без env_config.get
+        self.cfg = SimpleNamespace(**env_config.to_dict())
         self.recorder = None
         self.recorder_ready = threading.Event()
-        self.stop_recorder = False
+        self.stop_recorder = threading.Event()
         self.prev_text = ""
         
         # WebSocket соединения
         self.control_connections = set()
         self.data_connections = set()
-        self.audio_queue = asyncio.Queue()
+        
+        # Сообщения для data клиентов из потока recorder: поток только добавляет
+        # в deque, event loop будится одним событием на пачку накопившихся сообщений
+        self.pending_messages = deque()
+        self.pending_event = asyncio.Event()
+        
+        # Последнее realtime сообщение, еще не отправленное клиентам: частые
+        # промежуточные обновления перезаписывают друг друга и уходят одним фреймом
+        self.latest_realtime = None
+        
+        # Метка времени консольного вывода: HH:MM:SS форматируется раз в секунду
+        self._ts_second = None
+        self._ts_prefix = ""
+        
+        # Аудио от data клиентов: event loop только читает сокеты и кладет чанки
+        # в очередь, ресамплинг и feed_audio выполняются в отдельном потоке
+        self.audio_chunks = queue.Queue(maxsize=AUDIO_QUEUE_CHUNKS)
+        
+        # FIR фильтры ресамплинга по паре (up, down), рассчитываются один раз
+        self._resample_windows = {}
+        
+        if _decimate is not None:
+            # Компиляция при старте, чтобы первый чанк не ждал JIT. Вход - readonly массив
+            # поверх bytes, как у чанков из WebSocket: для записываемого numba скомпилировал бы
+            # другую специализацию
+            src = np.frombuffer(bytes(6), dtype=np.int16)
+            _decimate(src, self._resample_window(1, 3), 3, np.empty(1, dtype=np.int16))
         
         # Разрешенные методы и параметры для безопасности
         self.allowed_methods = [
@@ -86,10 +219,10 @@ class STTServer:
         
         # Основные параметры модели
         logger.info("MODEL SETTINGS:")
-        logger.info(f"  Whisper Model: {env_config.get('model')}")
-        logger.info(f"  Language: {env_config.get('language')}")
-        logger.info(f"  Real-time Model: {env_config.get('realtime_model_type')}")
-        configured_device = env_config.get('device')
+        logger.info(f"  Whisper Model: {self.cfg.model}")
+        logger.info(f"  Language: {self.cfg.language}")
+        logger.info(f"  Real-time Model: {self.cfg.realtime_model_type}")
+        configured_device = self.cfg.device
         actual_device = self.get_actual_device()
         logger.info(f"  Configured Device: {configured_device}")
         logger.info(f"  Actual Device: {actual_device}")
@@ -98,29 +231,29 @@ class STTServer:
         
         # Сетевые параметры
         logger.info("NETWORK SETTINGS:")
-        logger.info(f"  Control Port: {env_config.get('control_port')}")
-        logger.info(f"  Data Port: {env_config.get('data_port')}")
+        logger.info(f"  Control Port: {self.cfg.control_port}")
+        logger.info(f"  Data Port: {self.cfg.data_port}")
         
         # Настройки транскрипции
         logger.info("TRANSCRIPTION SETTINGS:")
-        realtime_status = "Enabled" if env_config.get('enable_realtime_transcription') else "Disabled"
+        realtime_status = "Enabled" if self.cfg.enable_realtime_transcription else "Disabled"
         logger.info(f"  Real-time Transcription: {realtime_status}")
-        onnx_status = "Enabled" if env_config.get('silero_use_onnx') else "Disabled"
+        onnx_status = "Enabled" if self.cfg.silero_use_onnx else "Disabled"
         logger.info(f"  Silero ONNX: {onnx_status}")
-        logger.info(f"  Real-time Pause: {env_config.get('realtime_processing_pause')}s")
+        logger.info(f"  Real-time Pause: {self.cfg.realtime_processing_pause}s")
         
         # Настройки VAD
         logger.info("VAD SETTINGS:")
-        logger.info(f"  Silero Sensitivity: {env_config.get('silero_sensitivity')}")
-        logger.info(f"  WebRTC Sensitivity: {env_config.get('webrtc_sensitivity')}")
-        logger.info(f"  Post Speech Silence: {env_config.get('post_speech_silence_duration')}s")
-        logger.info(f"  Min Recording Length: {env_config.get('min_length_of_recording')}s")
+        logger.info(f"  Silero Sensitivity: {self.cfg.silero_sensitivity}")
+        logger.info(f"  WebRTC Sensitivity: {self.cfg.webrtc_sensitivity}")
+        logger.info(f"  Post Speech Silence: {self.cfg.post_speech_silence_duration}s")
+        logger.info(f"  Min Recording Length: {self.cfg.min_length_of_recording}s")
         
         # Настройки качества
         logger.info("QUALITY SETTINGS:")
-        logger.info(f"  Beam Size: {env_config.get('beam_size')}")
-        logger.info(f"  Beam Size (Real-time): {env_config.get('beam_size_realtime')}")
-        initial_prompt = env_config.get('initial_prompt')
+        logger.info(f"  Beam Size: {self.cfg.beam_size}")
+        logger.info(f"  Beam Size (Real-time): {self.cfg.beam_size_realtime}")
+        initial_prompt = self.cfg.initial_prompt
         prompt_preview = initial_prompt[:40] + "..." if len(initial_prompt) > 40 else initial_prompt
         logger.info(f"  Initial Prompt: {prompt_preview}")
         
@@ -172,6 +305,18 @@ class STTServer:
         except Exception as e:
             logger.error(f"  Error checking GPU status: {e}")
         
+        # Silero VAD в ONNX режиме создает сессию без явных providers, то есть
+        # с CUDAExecutionProvider, если установлен onnxruntime-gpu
+        if self.cfg.silero_use_onnx:
+            try:
+                import onnxruntime
+                providers = onnxruntime.get_available_providers()
+                logger.info(f"  ONNX Runtime Providers: {', '.join(providers)}")
+                if self.cfg.device == 'cuda' and 'CUDAExecutionProvider' not in providers:
+                    logger.warning("  Silero VAD (ONNX) will run on CPU - install onnxruntime-gpu")
+            except ImportError:
+                logger.warning("  onnxruntime not available - Silero VAD cannot use ONNX")
+        
         logger.info("-" * 30)
     
     def get_actual_device(self):
@@ -185,6 +330,19 @@ class STTServer:
         except ImportError:
             return "cpu"
         
+    def resolve_compute_type(self):
+        """
+        Тип вычислений CTranslate2 для моделей recorder.
+        
+        RealtimeSTT применяет один compute_type и к real-time, и к основной модели,
+        поэтому по умолчанию остается 'default' (float16 на GPU, float32 на CPU).
+        COMPUTE_TYPE=int8 включает квантование: int8_float16 на GPU, int8 на CPU.
+        """
+        compute_type = self.cfg.compute_type
+        if compute_type == 'int8':
+            return 'int8_float16' if self.cfg.device == 'cuda' and self.get_actual_device() == 'cuda' else 'int8'
+        return compute_type or 'default'
+    
     def log_recorder_config(self, config):
         """Логирование конфигурации recorder'а."""
         logger.info("AUDIORECORDER CONFIG:")
@@ -241,20 +399,44 @@ class STTServer:
             text = text[0].upper() + text[1:]
         return text
     
+    def enqueue_message(self, message, loop):
+        """Передача сообщения для data клиентов из потока recorder в event loop."""
+        self.pending_messages.append(message)
+        # Финальный текст заменяет еще не отправленный промежуточный
+        self.latest_realtime = None
+        self.wake_broadcast(loop)
+    
+    def publish_realtime(self, message, loop):
+        """Замена неотправленного realtime сообщения более свежим."""
+        self.latest_realtime = message
+        self.wake_broadcast(loop)
+    
+    def wake_broadcast(self, loop):
+        """Пробуждение broadcast_audio_messages из потока recorder."""
+        # Событие уже установлено - broadcast еще не начал разбор очереди и заберет сообщение
+        if not self.pending_event.is_set():
+            loop.call_soon_threadsafe(self.pending_event.set)
+    
+    def timestamp(self):
+        """Текущее время HH:MM:SS.mmm для консольного вывода."""
+        ms = int(time.time() * 1000)
+        second, millis = divmod(ms, 1000)
+        if second != self._ts_second:
+            self._ts_prefix = time.strftime('%H:%M:%S', time.localtime(second))
+            self._ts_second = second
+        return f"{self._ts_prefix}.{millis:03d}"
+    
     def text_detected(self, text, loop):
         """Обработка real-time текста."""
         text = self.preprocess_text(text)
         self.prev_text = text
         
         # Отправляем в очередь для WebSocket клиентов
-        message = json.dumps({
-            'type': 'realtime',
-            'text': text
-        })
-        asyncio.run_coroutine_threadsafe(self.audio_queue.put(message), loop)
+        message = _REALTIME_PREFIX + _json_str(text) + '}'
+        self.publish_realtime(message, loop)
         
         # Выводим в консоль сервера
-        timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        timestamp = self.timestamp()
         print(f"\r[{timestamp}] {Colors.CYAN}{text}{Colors.ENDC}", flush=True, end='')
     
     def process_final_text(self, text, loop):
@@ -263,41 +445,38 @@ class STTServer:
         if not text.strip():
             return
             
-        message = json.dumps({
-            'type': 'fullSentence', 
-            'text': text
-        })
-        asyncio.run_coroutine_threadsafe(self.audio_queue.put(message), loop)
+        message = _FULL_SENTENCE_PREFIX + _json_str(text) + '}'
+        self.enqueue_message(message, loop)
         
-        timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        timestamp = self.timestamp()
         print(f"\r[{timestamp}] {Colors.BOLD}Предложение:{Colors.ENDC} {Colors.GREEN}{text}{Colors.ENDC}\n")
         
     def create_recorder_config(self, loop):
         """Создание конфигурации для recorder."""
         return {
-            'model': env_config.get('model'),
-            'language': env_config.get('language'),
-            'realtime_model_type': env_config.get('realtime_model_type'),
-            'device': env_config.get('device'),
-            'compute_type': 'default',
+            'model': self.cfg.model,
+            'language': self.cfg.language,
+            'realtime_model_type': self.cfg.realtime_model_type,
+            'device': self.cfg.device,
+            'compute_type': self.resolve_compute_type(),
             
             # Real-time настройки
-            'enable_realtime_transcription': env_config.get('enable_realtime_transcription'),
-            'realtime_processing_pause': env_config.get('realtime_processing_pause'),
+            'enable_realtime_transcription': self.cfg.enable_realtime_transcription,
+            'realtime_processing_pause': self.cfg.realtime_processing_pause,
             'on_realtime_transcription_update': lambda text: self.text_detected(text, loop),
             
             # VAD настройки
-            'silero_sensitivity': env_config.get('silero_sensitivity'),
-            'silero_use_onnx': env_config.get('silero_use_onnx'),
-            'webrtc_sensitivity': env_config.get('webrtc_sensitivity'),
-            'post_speech_silence_duration': env_config.get('post_speech_silence_duration'),
-            'min_length_of_recording': env_config.get('min_length_of_recording'),
+            'silero_sensitivity': self.cfg.silero_sensitivity,
+            'silero_use_onnx': self.cfg.silero_use_onnx,
+            'webrtc_sensitivity': self.cfg.webrtc_sensitivity,
+            'post_speech_silence_duration': self.cfg.post_speech_silence_duration,
+            'min_length_of_recording': self.cfg.min_length_of_recording,
             'silero_deactivity_detection': True,
             
             # Качество
-            'beam_size': env_config.get('beam_size'),
-            'beam_size_realtime': env_config.get('beam_size_realtime'),
-            'initial_prompt': env_config.get('initial_prompt'),
+            'beam_size': self.cfg.beam_size,
+            'beam_size_realtime': self.cfg.beam_size_realtime,
+            'initial_prompt': self.cfg.initial_prompt,
             
             # Настройки для контейнера
             'use_microphone': False,
@@ -322,8 +501,8 @@ class STTServer:
             def process_text_wrapper(text):
                 self.process_final_text(text, loop)
             
-            # Основной цикл обработки
-            while not self.stop_recorder:
+            # Основной цикл обработки (не стартует, если остановка запрошена во время загрузки модели)
+            while not self.stop_recorder.is_set():
                 self.recorder.text(process_text_wrapper)
                 
         except Exception as e:
@@ -339,10 +518,7 @@ class STTServer:
         try:
             async for message in websocket:
                 if not self.recorder_ready.is_set():
-                    await websocket.send(json.dumps({
-                        "status": "error", 
-                        "message": "Recorder не готов"
-                    }))
+                    await websocket.send(_RECORDER_NOT_READY_RESPONSE)
                     continue
                     
                 try:
@@ -387,10 +563,7 @@ class STTServer:
                         }))
                         
                 except json.JSONDecodeError:
-                    await websocket.send(json.dumps({
-                        "status": "error",
-                        "message": "Неверный JSON"
-                    }))
+                    await websocket.send(_INVALID_JSON_RESPONSE)
                     
         except websockets.exceptions.ConnectionClosed:
             logger.info("Control client disconnected")
@@ -405,54 +578,174 @@ class STTServer:
         try:
             async for message in websocket:
                 if isinstance(message, bytes):
-                    # Парсим метаданные
-                    metadata_length = int.from_bytes(message[:4], byteorder='little')
-                    metadata_json = message[4:4+metadata_length].decode('utf-8')
-                    metadata = json.loads(metadata_json)
-                    sample_rate = metadata['sampleRate']
+                    # Парсим метаданные через memoryview, без копирования частей пакета
+                    view = memoryview(message)
+                    (metadata_length,) = _METADATA_LENGTH.unpack_from(view, 0)
+                    sample_rate = _json_loads(view[4:4+metadata_length])['sampleRate']
                     
                     # Извлекаем аудио данные
-                    chunk = message[4+metadata_length:]
+                    chunk = view[4+metadata_length:]
                     
-                    # Ресамплинг если нужно
-                    if sample_rate != 16000:
-                        chunk = self.decode_and_resample(chunk, sample_rate, 16000)
-                    
-                    # Отправляем в recorder
+                    # Ресамплинг и передача в recorder - в потоке audio_consumer_thread
                     if self.recorder and self.recorder_ready.is_set():
-                        self.recorder.feed_audio(chunk)
+                        self.enqueue_audio(chunk, sample_rate)
                         
         except websockets.exceptions.ConnectionClosed:
             logger.info("Data client disconnected")
         finally:
             self.data_connections.remove(websocket)
+            self.drop_pending_audio()
             if self.recorder:
                 self.recorder.clear_audio_queue()
     
-    def decode_and_resample(self, audio_data, original_sample_rate, target_sample_rate):
-        """Ресамплинг аудио."""
+    def enqueue_audio(self, chunk, sample_rate):
+        """Передача чанка в поток ресамплинга; при переполнении теряется самый старый чанк."""
+        try:
+            self.audio_chunks.put_nowait((chunk, sample_rate))
+        except queue.Full:
+            # Задержка распознавания не растет неограниченно, если поток не успевает
+            try:
+                self.audio_chunks.get_nowait()
+            except queue.Empty:
+                pass
+            self.audio_chunks.put_nowait((chunk, sample_rate))
+    
+    def drop_pending_audio(self):
+        """Удаление чанков, еще не переданных в recorder."""
+        try:
+            while True:
+                self.audio_chunks.get_nowait()
+        except queue.Empty:
+            pass
+    
+    def audio_consumer_thread(self):
+        """Поток ресамплинга и передачи аудио в recorder (None в очереди - остановка)."""
+        # Буфер ресамплинга потока: чанки пишутся в него на место,
+        # а recorder получает memoryview без промежуточных массивов и bytes
+        pcm_out = None
+        
+        # Энергетический гейт: чанки тише адаптивного уровня шума заменяются нулями
+        # той же длины. Длительность тишины для recorder сохраняется, а WebRTC VAD
+        # отбрасывает нули сразу, не запуская на них Silero
+        energy_gate = self.cfg.energy_gate
+        noise_floor = ENERGY_GATE_INITIAL_FLOOR
+        silence = b''
+        
+        while True:
+            item = self.audio_chunks.get()
+            if item is None:
+                break
+            chunk, sample_rate = item
+            try:
+                if sample_rate != 16000:
+                    pcm_out = self.resample_buffer(pcm_out, len(chunk) // 2, sample_rate, 16000)
+                    chunk = self.decode_and_resample(chunk, sample_rate, 16000, pcm_out)
+                if energy_gate:
+                    rms = _chunk_rms(chunk)
+                    if rms < ENERGY_GATE_ADAPT_RATIO * noise_floor:
+                        noise_floor = 0.99 * noise_floor + 0.01 * rms
+                    if rms < ENERGY_GATE_SILENCE_RATIO * noise_floor:
+                        if len(silence) < len(chunk):
+                            silence = bytes(len(chunk))
+                        chunk = memoryview(silence)[:len(chunk)]
+                if self.recorder:
+                    self.recorder.feed_audio(chunk)
+            except Exception as e:
+                logger.error(f"Error in audio consumer: {e}")
+        
+        logger.info("Audio consumer thread finished")
+    
+    def _resample_window(self, up, down):
+        """
+        FIR фильтр для resample_poly (тот же, что scipy строит по умолчанию).
+        
+        Хранится во float32: тип результата resample_poly определяется типами
+        сигнала и фильтра, и фильтр float64 поднял бы весь расчет до float64.
+        """
+        window = self._resample_windows.get((up, down))
+        if window is None:
+            max_rate = max(up, down)
+            window = firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+            window = window.astype(np.float32)
+            self._resample_windows[(up, down)] = window
+        return window
+    
+    def decode_and_resample(self, audio_data, original_sample_rate, target_sample_rate, out=None):
+        """
+        Ресамплинг аудио.
+        
+        Полифазный фильтр (48000 -> 16000 это up=1, down=3) не строит FFT на каждый
+        небольшой чанк, в отличие от scipy.signal.resample.
+        
+        Args:
+            out: Буфер int16 для результата (см. resample_buffer), переиспользуемый между чанками
+            
+        Returns:
+            Байтовый memoryview на начало out (действителен до следующего вызова с тем же out)
+        """
         if original_sample_rate == target_sample_rate:
             return audio_data
             
         audio_np = np.frombuffer(audio_data, dtype=np.int16)
-        num_original_samples = len(audio_np)
-        num_target_samples = int(num_original_samples * target_sample_rate / original_sample_rate)
-        resampled_audio = resample(audio_np, num_target_samples)
-        return np.array(resampled_audio, dtype=np.int16).tobytes()
+        if out is None:
+            out = self.resample_buffer(None, len(audio_np), original_sample_rate, target_sample_rate)
+        
+        divisor = gcd(original_sample_rate, target_sample_rate)
+        up = target_sample_rate // divisor
+        down = original_sample_rate // divisor
+        if _decimate is not None and up == 1:
+            # Целочисленная децимация (48000 -> 16000) тем же фильтром без промежуточных массивов
+            n_out = _decimate(audio_np, self._resample_window(up, down), down, out)
+        else:
+            resampled_audio = resample_poly(
+                audio_np.astype(np.float32), up, down, window=self._resample_window(up, down)
+            )
+            np.clip(resampled_audio, -32768, 32767, out=resampled_audio)
+            n_out = len(resampled_audio)
+            out[:n_out] = resampled_audio
+        return out[:n_out].data.cast('B')
+    
+    @staticmethod
+    def resample_buffer(buffer, num_samples, original_sample_rate, target_sample_rate):
+        """
+        Буфер результата ресамплинга, вмещающий num_samples входных отсчетов.
+        
+        Возвращает переданный буфер, если он достаточного размера, иначе новый
+        (не меньше RESAMPLE_BUFFER_SAMPLES отсчетов).
+        """
+        needed = -(-num_samples * target_sample_rate // original_sample_rate)
+        if buffer is not None and len(buffer) >= needed:
+            return buffer
+        return np.empty(max(needed, RESAMPLE_BUFFER_SAMPLES), dtype=np.int16)
     
     async def broadcast_audio_messages(self):
         """Трансляция сообщений всем data клиентам."""
         while True:
             try:
-                message = await self.audio_queue.get()
+                await self.pending_event.wait()
+                if not self.pending_messages:
+                    # Только промежуточный текст: короткое окно, чтобы объединить
+                    # следующие за ним обновления в одно сообщение
+                    await asyncio.sleep(REALTIME_COALESCE_SEC)
+                # Сброс до разбора: сообщение, добавленное во время разбора, снова установит событие
+                self.pending_event.clear()
+                
+                # Финальные предложения отправляются все и по порядку, затем последний
+                # промежуточный текст (он всегда новее финальных, см. enqueue_message)
+                messages = []
+                while self.pending_messages:
+                    messages.append(self.pending_messages.popleft())
+                realtime, self.latest_realtime = self.latest_realtime, None
+                if realtime is not None:
+                    messages.append(realtime)
+                
                 if not self.data_connections:
                     continue
-                    
-                for conn in list(self.data_connections):
-                    try:
-                        await conn.send(message)
-                    except websockets.exceptions.ConnectionClosed:
-                        self.data_connections.discard(conn)
+                for message in messages:
+                    # broadcast кодирует и фреймирует сообщение один раз и пишет готовые байты
+                    # в каждый транспорт без ожидания: медленный клиент не задерживает остальных,
+                    # закрытые соединения пропускаются и удаляются в data_handler
+                    websockets.broadcast(self.data_connections, message)
             except Exception as e:
                 logger.error(f"Error in broadcast: {e}")
     
@@ -460,24 +753,26 @@ class STTServer:
         """Запуск сервера."""
         try:
             # Получаем event loop
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             
             # Запускаем WebSocket серверы
             control_server = await websockets.serve(
-                self.control_handler, "0.0.0.0", env_config.get('control_port')
+                self.control_handler, "0.0.0.0", self.cfg.control_port
             )
+            # PCM аудио не сжимается: permessage-deflate на data канале только тратит CPU
             data_server = await websockets.serve(
-                self.data_handler, "0.0.0.0", env_config.get('data_port')
+                self.data_handler, "0.0.0.0", self.cfg.data_port,
+                compression=None, max_size=DATA_MAX_MESSAGE_SIZE, write_limit=DATA_WRITE_LIMIT
             )
             
-            logger.info(f"Control WebSocket server started on port {env_config.get('control_port')}")
-            logger.info(f"Data WebSocket server started on port {env_config.get('data_port')}")
+            logger.info(f"Control WebSocket server started on port {self.cfg.control_port}")
+            logger.info(f"Data WebSocket server started on port {self.cfg.data_port}")
             
             # Запускаем HTTP API сервер для загрузки файлов
             http_server = None
             try:
                 from http_api import HTTPTranscribeServer
-                http_port = env_config.get('http_port', 8013)
+                http_port = self.cfg.http_port
                 http_server_instance = HTTPTranscribeServer(port=http_port)
                 http_server = await http_server_instance.start()
                 logger.info(f"HTTP API server started on port {http_port}")
@@ -489,12 +784,17 @@ class STTServer:
             # Запускаем broadcast задачу
             broadcast_task = asyncio.create_task(self.broadcast_audio_messages())
             
+            # Запускаем поток ресамплинга аудио
+            audio_thread = threading.Thread(target=self.audio_consumer_thread, daemon=True)
+            audio_thread.start()
+            
             # Запускаем recorder в отдельном потоке
             recorder_thread = threading.Thread(target=self.recorder_thread, args=(loop,))
             recorder_thread.start()
             
-            # Ждем готовности recorder
-            self.recorder_ready.wait()
+            # Ждем готовности recorder без блокировки event loop: пока загружается
+            # модель, WebSocket и HTTP серверы продолжают обслуживать соединения
+            await loop.run_in_executor(None, self.recorder_ready.wait)
             logger.info("STT Server is ready for connections!")
             
             # Ждем завершения
@@ -513,7 +813,12 @@ class STTServer:
     
     async def shutdown(self):
         """Корректное завершение работы."""
-        self.stop_recorder = True
+        # Повторный вызов не должен второй раз останавливать recorder
+        if self.stop_recorder.is_set():
+            return
+        self.stop_recorder.set()
+        self.drop_pending_audio()
+        self.audio_chunks.put_nowait(None)
         if self.recorder:
             self.recorder.abort()
             self.recorder.stop()
@@ -572,4 +877,10 @@ async def main():
     await server.run()
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    # uvloop (опционально) ускоряет прием и рассылку WebSocket сообщений
+    try:
+        import uvloop
+        run = uvloop.run
+    except (ImportError, AttributeError):
+        run = asyncio.run
+    run(main())
\ No newline at end of file
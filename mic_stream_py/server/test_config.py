@@ -10,7 +10,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 try:
-    from env_config import env_config
+    from env_config import EnvConfig, env_config
     
     print("=== Тестирование конфигурации из переменных окружения ===")
     print()
@@ -38,7 +38,66 @@ try:
     # Тестирование обновления
     env_config.update('test_param', 'test_value')
     print(f"Тестовый параметр: {env_config.get('test_param')}")
-    
+
+    print()
+    print("=== Тестирование разбора значений ===")
+
+    def parsed(env_name: str, value: str, key: str):
+        """Значение параметра key при единственной переменной env_name=value."""
+        return EnvConfig(environ={env_name: value}).get(key)
+
+    defaults = EnvConfig(environ={})
+
+    # (переменная, параметр, значение в окружении, ожидаемый результат)
+    cases = [
+        # str: значение берется как есть, пустая строка тоже
+        ("WHISPER_MODEL", "model", "large-v3", "large-v3"),
+        ("WHISPER_MODEL", "model", "", ""),
+        # int: ошибка разбора или пустое значение -> значение по умолчанию
+        ("CONTROL_PORT", "control_port", "9000", 9000),
+        ("CONTROL_PORT", "control_port", " 9000 ", 9000),
+        ("CONTROL_PORT", "control_port", "abc", defaults.get("control_port")),
+        ("CONTROL_PORT", "control_port", "", defaults.get("control_port")),
+        # float
+        ("SILERO_SENSITIVITY", "silero_sensitivity", "0.3", 0.3),
+        ("SILERO_SENSITIVITY", "silero_sensitivity", "high", defaults.get("silero_sensitivity")),
+        ("SILERO_SENSITIVITY", "silero_sensitivity", "", defaults.get("silero_sensitivity")),
+        # bool: регистр и пробелы по краям не важны
+        ("ENERGY_GATE", "energy_gate", "true", True),
+        ("ENERGY_GATE", "energy_gate", " Yes ", True),
+        ("ENERGY_GATE", "energy_gate", "1", True),
+        ("ENABLE_REALTIME_TRANSCRIPTION", "enable_realtime_transcription", "OFF", False),
+        ("ENABLE_REALTIME_TRANSCRIPTION", "enable_realtime_transcription", "0", False),
+        # Неверное или пустое значение -> True по умолчанию, а не False от разбора
+        ("ENABLE_REALTIME_TRANSCRIPTION", "enable_realtime_transcription", "maybe", True),
+        ("ENABLE_REALTIME_TRANSCRIPTION", "enable_realtime_transcription", "", True),
+        # optional: none/null/auto -> None (то есть значение по умолчанию)
+        ("LANGUAGE", "language", "ru", "ru"),
+        ("LANGUAGE", "language", "auto", None),
+        ("LANGUAGE", "language", " None ", None),
+        ("LANGUAGE", "language", "null", None),
+        ("LANGUAGE", "language", "", ""),
+        ("COMPUTE_TYPE", "compute_type", "int8", "int8"),
+        ("COMPUTE_TYPE", "compute_type", "AUTO", None),
+    ]
+
+    failed = 0
+    for env_name, key, value, expected in cases:
+        result = parsed(env_name, value, key)
+        if result == expected and type(result) is type(expected):
+            print(f"✅ {env_name}={value!r} -> {result!r}")
+        else:
+            failed += 1
+            print(f"❌ {env_name}={value!r}: ожидалось {expected!r}, получено {result!r}")
+
+    # Отсутствующая переменная -> значение по умолчанию из схемы
+    assert defaults.get("control_port") == 8011
+    assert defaults.get("energy_gate") is False
+    assert defaults.get("enable_realtime_transcription") is True
+    assert defaults.get("language") is None
+
+    assert failed == 0, f"неверный разбор значений: {failed}"
+
     print()
     print("✅ Конфигурация загружена успешно!")
     
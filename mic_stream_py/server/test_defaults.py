@@ -4,31 +4,15 @@
 Убеждается, что сервер может запуститься без конфигурации.
 """
 
-import os
 import sys
 from env_config import EnvConfig
 
-# Убираем все переменные окружения связанные с конфигурацией
-env_vars_to_remove = [
-    'WHISPER_MODEL', 'LANGUAGE', 'REALTIME_MODEL_TYPE', 'DEVICE',
-    'ENABLE_REALTIME_TRANSCRIPTION', 'SILERO_USE_ONNX',
-    'SILERO_SENSITIVITY', 'WEBRTC_SENSITIVITY', 
-    'POST_SPEECH_SILENCE_DURATION', 'MIN_LENGTH_OF_RECORDING',
-    'BEAM_SIZE', 'BEAM_SIZE_REALTIME', 'REALTIME_PROCESSING_PAUSE',
-    'INITIAL_PROMPT', 'CONTROL_PORT', 'DATA_PORT'
-]
-
-for var in env_vars_to_remove:
-    if var in os.environ:
-        del os.environ[var]
-
-# Теперь импортируем и тестируем
-
 def test_defaults():
     """Тест значений по умолчанию."""
     print("=== Тест значений по умолчанию (без .env файла) ===\n")
     
-    config = EnvConfig()
+    # Пустое окружение вместо текущего: проверяются только значения по умолчанию
+    config = EnvConfig(environ={})
     
     expected_defaults = {
         'model': 'medium',